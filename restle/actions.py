@@ -1,16 +1,66 @@
 import six
-from requests import Session
 
+from restle import deadlines, sessions, uploads, urls
+from restle.compression import CHUNK_SIZE, compress, get_accept_encoding, iter_compress, read_response
 from restle.exceptions import HTTPException
 from restle.serializers import URLSerializer
 
 
+class RawResponse(object):
+    """
+    An action response whose body is passed through without being decompressed or deserialized, e.g., to relay it to
+    another client. `headers` include the Content-Encoding (and Content-Type) of the body as sent by the server.
+    """
+
+    def __init__(self, response, chunk_size=CHUNK_SIZE):
+        self.status_code = response.status_code
+        self.reason = response.reason
+        self.headers = response.headers
+        self.chunk_size = chunk_size
+        self._response = response
+        self._content = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self):
+        """Yields the body as it's received. The body can only be iterated over once."""
+
+        raw = self._response.raw
+
+        try:
+            if hasattr(raw, 'stream'):
+                for chunk in raw.stream(self.chunk_size, decode_content=False):
+                    yield chunk
+            else:
+                for chunk in iter(lambda: raw.read(self.chunk_size), b''):
+                    yield chunk
+        finally:
+            self.close()
+
+    @property
+    def content(self):
+        """The whole (undecoded) body"""
+
+        if self._content is None:
+            self._content = b''.join(self)
+        return self._content
+
+    def close(self):
+        self._response.close()
+
+
 class Action(object):
     """Action base class"""
 
     NO_RESPONSE = 'none'
     DICT_RESPONSE = 'dict'
     OBJECT_RESPONSE = 'object'
+    RAW_RESPONSE = 'raw'  # A RawResponse with the body already read
+    STREAM_RESPONSE = 'stream'  # A RawResponse which reads the body as it's iterated over
 
     def __init__(self, relative_path, **kwargs):
         self.relative_path = relative_path
@@ -26,6 +76,14 @@ class Action(object):
         self.response_aliases = kwargs.pop('response_aliases', {})
         self.serializer = kwargs.pop('serializer', None)
         self.deserializer = kwargs.pop('deserializer', None)
+        self.accept_encoding = kwargs.pop('accept_encoding', None)
+        self.request_encoding = kwargs.pop('request_encoding', None)
+        self.compress_min_size = kwargs.pop('compress_min_size', 1024)
+        self.timeout = kwargs.pop('timeout', None)
+        self.body_param = kwargs.pop('body_param', None)
+        self.body_content_type = kwargs.pop('body_content_type', 'application/octet-stream')
+        self.stream_body = kwargs.pop('stream_body', False)
+        self._resource = None
 
         self.combined_params = self.optional_params.union(self.required_params)
 
@@ -44,10 +102,18 @@ class Action(object):
         if missing_required_params:
             raise ValueError("Missing required parameter(s): '{0}'".format(', '.join(missing_required_params)))
 
+        uri = self.get_uri(resource._url)
+
+        if self.body_param is not None:
+            # The body is sent as-is (e.g., a file object or generator), and other parameters in the query string
+            body = params.pop(self.body_param, None)
+            uri = urls.canonicalize_url(uri, {self.param_aliases.get(k, k): v for k, v in six.iteritems(params)})
+            return self.process_response(
+                self.do_request(uri, body, self.body_content_type, resource._session), resource
+            )
+
         params, content_type = self.prepare_params({self.param_aliases.get(k, k): v for k, v in six.iteritems(params)})
-        return self.process_response(
-            self.do_request(self.get_uri(resource._url), params, content_type, resource._session)
-        )
+        return self.process_response(self.do_request(uri, params, content_type, resource._session), resource)
 
     def contribute_to_class(self, cls, name):
         self._attr_name = name
@@ -69,32 +135,68 @@ class Action(object):
         else:
             serializer = URLSerializer
 
+        if self.stream_body and self.params_via_post and serializer.content_type == 'application/json':
+            return uploads.iter_json(params), serializer.content_type
+
         return serializer.to_string(params), serializer.content_type
 
     def do_request(self, url, params, content_type, session=None):
         body = None
-        headers = None
-        if params and not self.params_via_post:
-            url += '?{0}'.format(params)
-        elif self.params_via_post:
+        headers = {'Accept-Encoding': self.accept_encoding or get_accept_encoding()}
+        if params and not self.params_via_post and self.body_param is None:
+            url = urls.canonicalize_url('{0}?{1}'.format(url, params))
+        elif self.params_via_post or self.body_param is not None:
             body = params
-            headers = {'Content-type': content_type}
+            headers['Content-type'] = content_type
+
+            # Streamed bodies (files, buffers and iterables) are compressed incrementally, and sent as they're read
+            if self.request_encoding and uploads.is_stream(body):
+                body = iter_compress(uploads.iter_chunks(body), self.request_encoding)
+                headers['Content-Encoding'] = self.request_encoding
+            elif self.request_encoding and body and len(body) >= self.compress_min_size:
+                body = compress(body, self.request_encoding)
+                headers['Content-Encoding'] = self.request_encoding
 
         if session is None:
-            session = Session()
+            session = sessions.create_session()
 
-        return getattr(session, self.http_method.lower())(url, data=body, headers=headers)
+        # The action's own timeout takes precedence over those of the resource class
+        meta = self._resource._meta if self._resource is not None else None
+        if self.timeout is not None or meta is None:
+            timeout = deadlines.get_timeout(url, self.timeout, deadline=deadlines.current())
+        else:
+            timeout = deadlines.get_timeout(url, meta.timeout, meta.host_timeouts, deadlines.current())
+
+        return deadlines.send(
+            session, self.http_method, url, deadlines.current(), data=body, headers=headers, stream=True,
+            timeout=timeout
+        )
+
+    def process_response(self, response, resource=None):
+        """
+        :param resource: The resource the action was called on. Unless it's frozen, the transfer statistics of the
+        response body are stored as its `compression_stats`.
+        """
 
-    def process_response(self, response):
         if response.status_code not in self.expected_http_codes:
+            response.close()
             raise HTTPException(
                 'Received unexpected response from server: {0} ({1})'.format(response.status_code, response.reason)
             )
 
         if self.response_type == self.NO_RESPONSE:
+            response.close()
             return
-
-        data = (self.deserializer or self._resource._meta.serializer).to_dict(response.text)
+        elif self.response_type == self.RAW_RESPONSE:
+            raw = RawResponse(response)
+            raw.content  # Reads the body, releasing the connection
+            return raw
+        elif self.response_type == self.STREAM_RESPONSE:
+            return RawResponse(response)
+
+        data, stats = read_response(response, self.deserializer or self._resource._meta.serializer)
+        if resource is not None and hasattr(resource, '__dict__'):  # Frozen resources are immutable, so don't record it
+            resource._compression_stats = stats
 
         def alias_keys(d):
             if isinstance(d, dict):
@@ -0,0 +1,222 @@
+import hashlib
+import marshal
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+MAGIC = b'RSTLCACH'
+VERSION = 1
+
+# Magic, version, number of slots, slot size
+HEADER = struct.Struct('<8sIII')
+
+# Sequence number (odd while the slot is being written), key digest, expiry time, last access time, payload length
+SLOT = struct.Struct('<Q20sddI')
+ACCESSED_OFFSET = 8 + 20 + 8
+
+EMPTY_KEY = b'\0' * 20
+WAYS = 4  # Number of slots a key may be stored in
+READ_ATTEMPTS = 8
+
+
+def get_default_path():
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, 'restle-cache-{0}'.format(os.getuid() if hasattr(os, 'getuid') else 0))
+
+
+class SharedCache(object):
+    """
+    A cache of deserialized response data shared by all processes on a host, stored in a memory-mapped file (in
+    /dev/shm, where available). Set it as `Meta.cache` of resource classes, so only one process fetches and parses a
+    hot resource until its entry expires (after `Meta.cache_ttl` seconds).
+
+    The file is a fixed-size table of slots. Each key can be stored in one of a few slots, and when they're all in use,
+    the least recently used one is replaced. Reads don't take locks: each slot has a sequence number which writers
+    make odd while they update it, so readers can detect (and retry) reads which overlap a write. Writers are
+    serialized with a file lock.
+
+    Values are serialized with `marshal`, so only data made of built-in types (such as deserialized JSON) can be
+    cached. Values larger than a slot are not cached.
+
+    Keys don't include the session's credentials, so processes sharing a cache file read each other's entries even if
+    they authenticate differently. Use a separate path per set of credentials. Files owned by another user, or which
+    other users can access, are refused.
+    """
+
+    def __init__(self, path=None, slots=4096, slot_size=16 * 1024):
+        """
+        :param path: Path of the cache file. Processes using the same path share the cache.
+        :param slots: Number of entries the cache holds. Ignored if the file already exists.
+        :param slot_size: Maximum size of an entry (including a 48 byte header). Ignored if the file already exists.
+        """
+
+        self.path = path or get_default_path()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        # Other users can create files in /dev/shm, so a file (or link) planted at the path must not be trusted
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+        try:
+            self._check_file()
+        except Exception:
+            os.close(self._fd)
+            raise
+
+        self._acquire()
+        try:
+            header = os.read(self._fd, HEADER.size)
+            if len(header) == HEADER.size and header.startswith(MAGIC):
+                _, version, slots, slot_size = HEADER.unpack(header)
+                if version != VERSION:
+                    raise ValueError('Cache file {0} has an unsupported version: {1}'.format(self.path, version))
+            else:
+                os.ftruncate(self._fd, HEADER.size + slots * slot_size)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, HEADER.pack(MAGIC, VERSION, slots, slot_size))
+        finally:
+            self._release()
+
+        self.slots = slots
+        self.slot_size = slot_size
+        self._mmap = mmap.mmap(self._fd, HEADER.size + slots * slot_size)
+
+    def _check_file(self):
+        st = os.fstat(self._fd)
+
+        if not stat.S_ISREG(st.st_mode):
+            raise ValueError('Cache file {0} is not a regular file'.format(self.path))
+        if hasattr(os, 'getuid') and (st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) & 0o077):
+            raise ValueError('Cache file {0} is owned by another user or accessible to other users'.format(self.path))
+
+    def _acquire(self):
+        self._lock.acquire()
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 0)
+
+    def _release(self):
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 0)
+        self._lock.release()
+
+    def _get_offsets(self, digest):
+        start = struct.unpack('<Q', digest[:8])[0]
+        return [HEADER.size + ((start + i) % self.slots) * self.slot_size for i in range(min(WAYS, self.slots))]
+
+    def _read_slot(self, offset, digest):
+        """Returns (key digest, expires, accessed, payload) of a slot. The payload is only read if the key matches."""
+
+        for _ in range(READ_ATTEMPTS):
+            sequence, key, expires, accessed, length = SLOT.unpack_from(self._mmap, offset)
+            if sequence % 2:
+                time.sleep(0)  # Being written
+                continue
+
+            payload = self._mmap[offset + SLOT.size:offset + SLOT.size + length] if key == digest else None
+
+            if struct.unpack_from('<Q', self._mmap, offset)[0] == sequence:
+                return key, expires, accessed, payload
+
+        return None, 0, 0, None
+
+    def get(self, key):
+        """Returns the cached value for a key (e.g., `RequestKey.hash`), or None if it's missing or expired"""
+
+        digest = hashlib.sha1(key.encode('utf-8')).digest()
+        now = time.time()
+
+        for offset in self._get_offsets(digest):
+            slot_key, expires, _, payload = self._read_slot(offset, digest)
+
+            if slot_key == digest and expires > now:
+                try:
+                    value = marshal.loads(payload)
+                except (EOFError, ValueError, TypeError):
+                    break
+
+                # Racing with a writer here only affects which entry is evicted next
+                struct.pack_into('<d', self._mmap, offset + ACCESSED_OFFSET, now)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key, value, ttl):
+        """
+        Stores a value for `ttl` seconds, replacing the least recently used entry if necessary.
+
+        :return: False if the value can't be cached (it's too large, or not made of built-in types)
+        """
+
+        try:
+            payload = marshal.dumps(value)
+        except ValueError:
+            return False
+
+        if SLOT.size + len(payload) > self.slot_size:
+            return False
+
+        digest = hashlib.sha1(key.encode('utf-8')).digest()
+        now = time.time()
+
+        self._acquire()
+        try:
+            candidates = []
+            for offset in self._get_offsets(digest):
+                _, slot_key, expires, accessed, _ = SLOT.unpack_from(self._mmap, offset)
+                if slot_key == digest:
+                    priority = -2
+                elif slot_key == EMPTY_KEY or expires <= now:
+                    priority = -1
+                else:
+                    priority = accessed
+                candidates.append((priority, offset))
+
+            self._write_slot(min(candidates)[1], digest, now + ttl, now, payload)
+        finally:
+            self._release()
+
+        return True
+
+    def _write_slot(self, offset, digest, expires, accessed, payload):
+        """Updates a slot, making its sequence number odd during the update so readers can detect it"""
+
+        sequence = struct.unpack_from('<Q', self._mmap, offset)[0] + 1
+
+        struct.pack_into('<Q', self._mmap, offset, sequence)
+        self._mmap[offset + SLOT.size:offset + SLOT.size + len(payload)] = payload
+        SLOT.pack_into(self._mmap, offset, sequence, digest, expires, accessed, len(payload))
+        struct.pack_into('<Q', self._mmap, offset, sequence + 1)
+
+    def delete(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).digest()
+
+        self._acquire()
+        try:
+            for offset in self._get_offsets(digest):
+                if SLOT.unpack_from(self._mmap, offset)[1] == digest:
+                    self._write_slot(offset, EMPTY_KEY, 0, 0, b'')
+        finally:
+            self._release()
+
+    def clear(self):
+        self._acquire()
+        try:
+            for i in range(self.slots):
+                self._write_slot(HEADER.size + i * self.slot_size, EMPTY_KEY, 0, 0, b'')
+        finally:
+            self._release()
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
@@ -0,0 +1,228 @@
+import bisect
+import weakref
+
+import six
+
+LOOKUPS = ('exact', 'in', 'gt', 'gte', 'lt', 'lte')
+
+
+class ResourceCollection(list):
+    """
+    A list of resources which can be queried by field value. Indexes are built on first use of a field: a hash index
+    for exact and `in` lookups, and a sorted index for range lookups (`gt`, `gte`, `lt`, `lte`). Lookups on indexed
+    fields are O(1) or O(log n) rather than scanning the whole list. Fields with unhashable values (e.g., lists) can't
+    be hash indexed, so exact and `in` lookups on them scan the list, and `group_by` raises ValueError.
+
+    Hash indexes are updated as members change (when they're refreshed or their fields are assigned); sorted indexes
+    are rebuilt on next use. Modifying the list itself discards all indexes.
+    """
+
+    def __init__(self, *args):
+        super(ResourceCollection, self).__init__(*args)
+
+        self._hash_indexes = {}
+        self._sorted_indexes = {}
+        self._indexed_values = {}
+        self._observed = {}
+        self._observer = None
+
+    def __reduce__(self):
+        return self.__class__, (list(self),)
+
+    def _invalidate(self):
+        self._hash_indexes = {}
+        self._sorted_indexes = {}
+        self._indexed_values = {}
+
+    def _observe(self):
+        """
+        Registers for change notifications from members which support them. Observers are removed from members once
+        the collection is garbage collected, so short-lived collections (e.g., the result of `filter()`) don't
+        accumulate on their members.
+        """
+
+        if self._observer is None:
+            observed = self._observed
+
+            def forget(ref):
+                for item in list(six.itervalues(observed)):
+                    item._remove_observer(observer)
+
+            ref = weakref.ref(self, forget)
+
+            def observer(resource, changed):
+                collection = ref()
+                if collection is not None:
+                    collection._on_change(resource, changed)
+
+            self._observer = observer
+
+        for item in self:
+            add_observer = getattr(item, '_add_observer', None)
+            if add_observer is not None and id(item) not in self._observed:
+                add_observer(self._observer)
+                self._observed[id(item)] = item
+
+    def _on_change(self, resource, changed):
+        for field in changed:
+            self._sorted_indexes.pop(field, None)
+
+            values = self._indexed_values.get(field)
+            if values is None or id(resource) not in values:
+                continue
+
+            index = self._hash_indexes[field]
+            old = values[id(resource)]
+            new = getattr(resource, field)
+
+            bucket = index.get(old, [])
+            bucket[:] = [x for x in bucket if x is not resource]
+            if not bucket:
+                index.pop(old, None)
+
+            index.setdefault(new, []).append(resource)
+            values[id(resource)] = new
+
+    def _get_hash_index(self, field):
+        index = self._hash_indexes.get(field)
+
+        if index is None:
+            self._observe()
+
+            index = {}
+            values = {}
+            for item in self:
+                value = getattr(item, field)
+                try:
+                    index.setdefault(value, []).append(item)
+                except TypeError:
+                    message = "Field '{0}' has unhashable values (e.g., lists), so it can't be indexed"
+                    raise ValueError(message.format(field))
+                values[id(item)] = value
+
+            self._hash_indexes[field] = index
+            self._indexed_values[field] = values
+
+        return index
+
+    def _get_sorted_index(self, field):
+        index = self._sorted_indexes.get(field)
+
+        if index is None:
+            self._observe()
+
+            pairs = sorted(
+                ((getattr(x, field), i) for i, x in enumerate(self) if getattr(x, field) is not None),
+                key=lambda x: x[0]
+            )
+            index = ([x[0] for x in pairs], [self[x[1]] for x in pairs])
+            self._sorted_indexes[field] = index
+
+        return index
+
+    def _scan(self, field, values):
+        """Returns the members whose value for a field equals any of the given values, without using an index"""
+
+        return [x for v in values for x in self if getattr(x, field) == v]
+
+    def _lookup(self, field, lookup, value):
+        if lookup in ('exact', 'in'):
+            values = [value] if lookup == 'exact' else value
+            try:
+                index = self._get_hash_index(field)
+                return [x for v in values for x in index.get(v, [])]
+            except (TypeError, ValueError):
+                return self._scan(field, values)  # Unhashable values (e.g., of a ListField) are compared one by one
+
+        keys, items = self._get_sorted_index(field)
+
+        if lookup == 'gt':
+            return items[bisect.bisect_right(keys, value):]
+        elif lookup == 'gte':
+            return items[bisect.bisect_left(keys, value):]
+        elif lookup == 'lt':
+            return items[:bisect.bisect_left(keys, value)]
+        else:
+            return items[:bisect.bisect_right(keys, value)]
+
+    def filter(self, **kwargs):
+        """
+        Returns the members matching all of the given lookups, e.g., `filter(sender='Pi Pyson', id__gte=100)`.
+        Supported lookups are `exact` (the default), `in`, `gt`, `gte`, `lt` and `lte`.
+        """
+
+        results = None
+
+        for key, value in six.iteritems(kwargs):
+            field, _, lookup = key.partition('__')
+            lookup = lookup or 'exact'
+            if lookup not in LOOKUPS:
+                raise ValueError("Unsupported lookup: '{0}'".format(lookup))
+
+            matches = self._lookup(field, lookup, value)
+            if results is None:
+                results = matches
+            else:
+                ids = set(id(x) for x in matches)
+                results = [x for x in results if id(x) in ids]
+
+        return ResourceCollection(self if results is None else results)
+
+    def get_by(self, value, field='id'):
+        """Returns the member with the given value for a field (by default, 'id'), or None"""
+
+        try:
+            matches = self._get_hash_index(field).get(value)
+        except (TypeError, ValueError):
+            matches = self._scan(field, [value])
+
+        return matches[0] if matches else None
+
+    def group_by(self, field):
+        """
+        Returns a dictionary of field values to collections of members with that value. Raises ValueError if the field
+        has unhashable values (e.g., lists).
+        """
+
+        return {k: ResourceCollection(v) for k, v in six.iteritems(self._get_hash_index(field))}
+
+    def append(self, item):
+        super(ResourceCollection, self).append(item)
+        self._invalidate()
+
+    def extend(self, items):
+        super(ResourceCollection, self).extend(items)
+        self._invalidate()
+
+    def insert(self, index, item):
+        super(ResourceCollection, self).insert(index, item)
+        self._invalidate()
+
+    def remove(self, item):
+        super(ResourceCollection, self).remove(item)
+        self._invalidate()
+
+    def pop(self, *args):
+        item = super(ResourceCollection, self).pop(*args)
+        self._invalidate()
+        return item
+
+    def __setitem__(self, key, value):
+        super(ResourceCollection, self).__setitem__(key, value)
+        self._invalidate()
+
+    def __delitem__(self, key):
+        super(ResourceCollection, self).__delitem__(key)
+        self._invalidate()
+
+    def clear(self):
+        del self[:]
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __imul__(self, n):
+        result = super(ResourceCollection, self).__imul__(n)
+        self._invalidate()
+        return result
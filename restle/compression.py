@@ -0,0 +1,198 @@
+import io
+import time
+import zlib
+
+GZIP = 'gzip'
+DEFLATE = 'deflate'
+BROTLI = 'br'
+ZSTD = 'zstd'
+
+CHUNK_SIZE = 64 * 1024
+
+_modules = {}
+_accept_encoding = None
+
+
+def _get_module(name):
+    """Imports an optional compression library on first use. Returns None if it isn't installed."""
+
+    if name not in _modules:
+        try:
+            _modules[name] = __import__(name)
+        except ImportError:
+            _modules[name] = None
+
+    return _modules[name]
+
+
+def _get_decodable_encodings():
+    """Returns the content encodings urllib3 decodes in responses (which depends on the libraries it finds)"""
+
+    try:
+        from urllib3.util.request import ACCEPT_ENCODING
+    except ImportError:
+        return {GZIP, DEFLATE}
+
+    return set(x.strip() for x in ACCEPT_ENCODING.split(','))
+
+
+def get_available_encodings():
+    """Returns the content encodings which can be both sent and received, in order of preference"""
+
+    encodings = []
+
+    if _get_module('zstandard') is not None:
+        encodings.append(ZSTD)
+    if _get_module('brotli') is not None:
+        encodings.append(BROTLI)
+
+    decodable = _get_decodable_encodings()
+    return [x for x in encodings if x in decodable] + [GZIP, DEFLATE]
+
+
+def get_accept_encoding():
+    """Returns the value of the Accept-Encoding header sent with requests"""
+
+    global _accept_encoding
+
+    if _accept_encoding is None:
+        _accept_encoding = ', '.join(get_available_encodings())
+
+    return _accept_encoding
+
+
+def compress(data, encoding):
+    """Compresses a request body with the given content encoding"""
+
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+
+    if encoding == GZIP:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    elif encoding == DEFLATE:
+        return zlib.compress(data)
+    elif encoding == BROTLI and _get_module('brotli') is not None:
+        return _get_module('brotli').compress(data)
+    elif encoding == ZSTD and _get_module('zstandard') is not None:
+        return _get_module('zstandard').ZstdCompressor().compress(data)
+
+    raise ValueError("Unsupported content encoding: '{0}'".format(encoding))
+
+
+def iter_compress(chunks, encoding):
+    """Compresses an iterable of byte chunks incrementally, so the whole body is never held in memory"""
+
+    if encoding in (GZIP, DEFLATE):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS if encoding == GZIP else zlib.MAX_WBITS)
+        compress_chunk, flush = compressor.compress, compressor.flush
+    elif encoding == BROTLI and _get_module('brotli') is not None:
+        compressor = _get_module('brotli').Compressor()
+        compress_chunk, flush = compressor.process, compressor.finish
+    elif encoding == ZSTD and _get_module('zstandard') is not None:
+        compressor = _get_module('zstandard').ZstdCompressor().compressobj()
+        compress_chunk, flush = compressor.compress, compressor.flush
+    else:
+        raise ValueError("Unsupported content encoding: '{0}'".format(encoding))
+
+    for chunk in chunks:
+        data = compress_chunk(chunk)
+        if data:
+            yield data
+
+    data = flush()
+    if data:
+        yield data
+
+
+class CompressionStats(object):
+    """Transfer statistics for a single response body"""
+
+    def __init__(self, url, encoding, wire_bytes, content_bytes, elapsed):
+        """
+        :param url: The URL of the response
+        :param encoding: The content encoding used by the server, or None if the body was not compressed
+        :param wire_bytes: Number of bytes received over the network
+        :param content_bytes: Number of bytes after decompression
+        :param elapsed: Time (in seconds) spent reading, decompressing and deserializing the body
+        """
+
+        self.url = url
+        self.encoding = encoding
+        self.wire_bytes = wire_bytes
+        self.content_bytes = content_bytes
+        self.elapsed = elapsed
+
+    @property
+    def ratio(self):
+        """Decompressed size relative to transferred size (higher is better)"""
+
+        if not self.wire_bytes:
+            return 1.0
+
+        return float(self.content_bytes) / self.wire_bytes
+
+    def __repr__(self):
+        return '<CompressionStats {0}: {1} -> {2} bytes ({3:.2f}x, {4:.4f}s)>'.format(
+            self.encoding or 'identity', self.wire_bytes, self.content_bytes, self.ratio, self.elapsed
+        )
+
+
+class ResponseReader(io.RawIOBase):
+    """File-like object which decompresses a streamed response body as it is read"""
+
+    def __init__(self, response, chunk_size=CHUNK_SIZE):
+        self._chunks = response.iter_content(chunk_size)
+        self._buffer = b''
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        self.bytes_read += size
+
+        return size
+
+
+def read_response(response, deserializer):
+    """
+    Deserializes a (streamed) response body without materializing `response.text`. Deserializers which implement
+    `from_file` are fed the decompressed stream directly; others receive the decoded body as a string.
+
+    :return: A tuple of (data, CompressionStats)
+    """
+
+    start = time.time()
+    reader = io.BufferedReader(ResponseReader(response))
+
+    try:
+        if hasattr(deserializer, 'from_file'):
+            data = deserializer.from_file(reader)
+            reader.read()  # Drain anything the deserializer didn't consume so the connection can be reused
+        else:
+            data = deserializer.to_dict(reader.read().decode(response.encoding or 'utf-8'))
+
+        content_bytes = reader.raw.bytes_read
+        try:
+            wire_bytes = response.raw.tell()
+        except (AttributeError, IOError, ValueError):
+            wire_bytes = content_bytes
+    finally:
+        response.close()
+
+    stats = CompressionStats(
+        response.url, response.headers.get('Content-Encoding'), wire_bytes, content_bytes, time.time() - start
+    )
+    response.compression_stats = stats
+
+    return data, stats
@@ -0,0 +1,202 @@
+import collections
+import threading
+import time
+
+import six
+
+from restle.exceptions import DeadlineExceeded
+
+_local = threading.local()
+
+# Budgets are measured with a monotonic clock (Python 3.3+), so system clock adjustments don't affect them
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class Deadline(object):
+    """A time by which a resource (including any nested resources it loads) or an action must complete"""
+
+    def __init__(self, seconds):
+        self.expires = _clock() + seconds
+
+    def remaining(self):
+        return self.expires - _clock()
+
+
+def to_deadline(value):
+    """Accepts a `Deadline` or a number of seconds"""
+
+    if value is None or isinstance(value, Deadline):
+        return value
+    return Deadline(value)
+
+
+def current():
+    """Returns the innermost deadline set with `deadline()` on this thread, or None"""
+
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+class deadline(object):
+    """
+    Context manager which bounds all requests made by restle on this thread within the block, e.g., action calls and
+    lazy loads, to the given number of seconds in total. Nested blocks can only shorten the deadline.
+    """
+
+    def __init__(self, seconds):
+        self.deadline = to_deadline(seconds)
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+
+        stack.append(earliest(self.deadline, current()))
+        return stack[-1]
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.stack.pop()
+
+
+def earliest(*deadlines):
+    deadlines = [x for x in deadlines if x is not None]
+    return min(deadlines, key=lambda x: x.expires) if deadlines else None
+
+
+def get_timeout(url, timeout=None, host_timeouts=None, deadline=None):
+    """
+    Returns the timeout to pass to requests: the timeout for the URL's host (or the default timeout), limited to the
+    time remaining before the deadline. Timeouts are either a number of seconds or a (connect, read) tuple.
+
+    :raises DeadlineExceeded: If the deadline has already passed
+    """
+
+    if host_timeouts:
+        host = six.moves.urllib_parse.urlsplit(url).netloc.lower()
+        timeout = host_timeouts.get(host, timeout)
+
+    if deadline is None:
+        return timeout
+
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded('Deadline exceeded before requesting {0}'.format(url))
+
+    if isinstance(timeout, tuple):
+        return tuple(remaining if x is None else min(x, remaining) for x in timeout)
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def send(session, method, url, deadline=None, **kwargs):
+    """Sends a request, raising `DeadlineExceeded` rather than a timeout error if the deadline passed meanwhile"""
+
+    from requests.exceptions import Timeout
+
+    try:
+        return getattr(session, method.lower())(url, **kwargs)
+    except Timeout:
+        if deadline is not None and deadline.remaining() <= 0:
+            raise DeadlineExceeded('Deadline exceeded while requesting {0}'.format(url))
+        raise
+
+
+class LatencyTracker(object):
+    """Tracks recent request latencies per host, to decide when to send a hedged request"""
+
+    def __init__(self, size=100, min_samples=20):
+        self.size = size
+        self.min_samples = min_samples
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def add(self, host, latency):
+        with self._lock:
+            if host not in self._latencies:
+                self._latencies[host] = collections.deque(maxlen=self.size)
+            self._latencies[host].append(latency)
+
+    def get_percentile(self, host, percentile=95):
+        """Returns the latency percentile for a host, or None if too few requests have been made to it"""
+
+        with self._lock:
+            latencies = sorted(self._latencies.get(host, []))
+
+        if len(latencies) < self.min_samples:
+            return None
+
+        return latencies[min(int(len(latencies) * percentile / 100.0), len(latencies) - 1)]
+
+
+latency_tracker = LatencyTracker()
+
+
+def hedged_send(session, method, url, delay, deadline=None, **kwargs):
+    """
+    Sends a request, and if no response has arrived after `delay` seconds, sends a duplicate. The first response to
+    arrive is returned, and the other is closed. Only use this for idempotent requests.
+    """
+
+    results = six.moves.queue.Queue()
+    state = {'done': False, 'pending': 0}
+    lock = threading.Lock()
+
+    def run():
+        try:
+            result = (send(session, method, url, deadline, **kwargs), None)
+        except Exception as e:
+            result = (None, e)
+
+        with lock:
+            state['pending'] -= 1
+            if state['done']:
+                if result[0] is not None:
+                    result[0].close()  # Lost the race
+                return
+
+            # An error only counts as the result if no other request is outstanding
+            if result[1] is None or state['pending'] == 0:
+                state['done'] = True
+                results.put(result)
+
+    def start():
+        with lock:
+            state['pending'] += 1
+
+        thread = threading.Thread(target=run, name='restle-hedged-request')
+        thread.daemon = True
+        thread.start()
+
+    start()
+
+    try:
+        response, error = results.get(timeout=delay)
+    except six.moves.queue.Empty:
+        start()
+        response, error = results.get()
+
+    if error is not None:
+        raise error
+
+    return response
+
+
+def request(session, method, url, deadline=None, hedge=None, **kwargs):
+    """
+    Sends a request bounded by a deadline. If `hedge` is given, GET requests are hedged (see `hedged_send`) after
+    `hedge` seconds, or if `hedge` is True, after the 95th percentile latency of recent requests to the same host.
+    """
+
+    if not hedge or method.upper() != 'GET':
+        return send(session, method, url, deadline, **kwargs)
+
+    host = six.moves.urllib_parse.urlsplit(url).netloc.lower()
+    delay = latency_tracker.get_percentile(host) if hedge is True else hedge
+
+    start = _clock()
+    if delay is None:
+        response = send(session, method, url, deadline, **kwargs)
+    else:
+        response = hedged_send(session, method, url, delay, deadline, **kwargs)
+
+    latency_tracker.add(host, _clock() - start)
+    return response
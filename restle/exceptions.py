@@ -13,6 +13,22 @@ class MissingFieldException(ResourceException):
     pass
 
 
+class ReplayException(ResourceException):
+    pass
+
+
+class DeadlineExceeded(ResourceException):
+    pass
+
+
+class ImplicitLoadException(ResourceException):
+    pass
+
+
+class ImplicitLoadWarning(UserWarning):
+    pass
+
+
 class HTTPException(six.moves.http_client.HTTPException):
     def __init__(self, message, response=None):
         super(HTTPException, self).__init__(message)
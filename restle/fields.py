@@ -1,5 +1,28 @@
+import threading
+
 import six
 
+from restle import deadlines, loading, profiling, urls
+from restle.collection import ResourceCollection
+
+
+class AnonymousObjectType(type):
+    """Metaclass for objects created by `ObjectField`, which allows them to be pickled"""
+
+    pass
+
+
+def _make_anonymous_object(name, attrs):
+    return AnonymousObjectType(name, (), attrs)
+
+
+def _reduce_anonymous_object(cls):
+    attrs = {k: v for k, v in six.iteritems(cls.__dict__) if not (k.startswith('__') and k.endswith('__'))}
+    return _make_anonymous_object, (cls.__name__, attrs)
+
+
+six.moves.copyreg.pickle(AnonymousObjectType, _reduce_anonymous_object)
+
 
 class Field(object):
     """Field base class"""
@@ -150,7 +173,7 @@ class ObjectField(Field):
                 self.aliases.get(k, k): self.to_python(v, resource) if isinstance(v, (dict, list)) else v
                 for k, v in six.iteritems(value)
             }
-            return type(self.class_name, (), d)
+            return _make_anonymous_object(self.class_name, d)
         elif isinstance(value, list):
             return [self.to_python(x, resource) if isinstance(x, (dict, list)) else x for x in value]
         else:
@@ -186,7 +209,8 @@ class NestedResourceField(Field):
     PARTIAL_OBJECT = 'partial'
     FULL_OBJECT = 'full'
 
-    def __init__(self, resource_class, nest_type, id_field='id', relative_path=None, *args, **kwargs):
+    def __init__(self, resource_class, nest_type, id_field='id', relative_path=None, bulk_path=None, bulk_size=100,
+                 bulk_key=None, expand_name=None, *args, **kwargs):
         """
         :param str nest_type: One of 'id', 'partial', 'full' depending on whether the resource is expanded or needs to
         be loaded separately.
@@ -194,6 +218,14 @@ class NestedResourceField(Field):
         when constructing the URI.
         :param relative_path: The relative path (from this resource) to the nested resource. May contain {id} which
         will be replaced with the resource id. E.g. '/nested-resource/{id}/'
+        :param bulk_path: For to-many fields of type 'id' or 'partial', the relative path to an endpoint which returns
+        many nested resources at once. Must contain {ids}, which will be replaced with a comma-separated list of ids.
+        E.g., '/nested-resource/?ids={ids}'
+        :param bulk_size: Maximum number of ids per bulk request
+        :param bulk_key: The key containing the list of resources in the bulk response. If not given, the response is
+        expected to be a list.
+        :param expand_name: The name used to ask the server to expand this field (see `Resource.get`). Defaults to the
+        field name.
         """
 
         super(NestedResourceField, self).__init__(*args, **kwargs)
@@ -208,33 +240,57 @@ class NestedResourceField(Field):
         self.type = nest_type
         self.id_field = id_field
         self.relative_path = relative_path
+        self.bulk_path = bulk_path
+        self.bulk_size = bulk_size
+        self.bulk_key = bulk_key
+        self.expand_name = expand_name
+
+    def get_id(self, obj):
+        return obj.get(self.id_field) if isinstance(obj, dict) else obj
 
     def get_uri(self, obj, base_uri):
         if not base_uri.endswith('/') and not self.relative_path.startswith('/'):
             base_uri += '/'
 
-        if self.type == self.ID_ONLY:
-            resource_id = obj
-        else:
-            resource_id = obj.get(self.id_field)
+        return ''.join((base_uri, self.relative_path.format(id=self.get_id(obj))))
+
+    def get_bulk_uri(self, ids, base_uri):
+        if not base_uri.endswith('/') and not self.bulk_path.startswith(('/', '?')):
+            base_uri += '/'
 
-        return ''.join((base_uri, self.relative_path.format(id=resource_id)))
+        ids = ','.join(six.moves.urllib_parse.quote(six.text_type(x), safe='') for x in ids)
+        return ''.join((base_uri, self.bulk_path.format(ids=ids)))
 
     def to_python(self, value, resource):
         if value is None:
             return value
 
+        # Fields the server was asked to expand are hydrated from the inlined object, if the server inlined it
+        expand = resource._expand.get(self._attr_name) if self.type != self.FULL_OBJECT else None
+        inlined = expand is not None and isinstance(value, dict)
+        if inlined:
+            nested = self.resource_class(session=resource._session)
+            if nested._is_complete(value):
+                nested._expand = expand
+                nested._url = self.get_uri(value, resource._url)
+                nested.populate_field_values(value)
+                return nested
+
+            # Partly inlined, so the nested resource is loaded from its URI (built from the id in the object)
+            if self.get_id(value) is None:
+                raise ValueError("Expanded nested resource has no '{0}' to build its URI from".format(self.id_field))
+
         if self.type in (self.PARTIAL_OBJECT, self.FULL_OBJECT) and not isinstance(value, dict):
             raise ValueError(
                 "Expected nested resource to be of type 'dict', got '{0}'".format(value.__class__.__name__)
             )
-        elif self.type == self.ID_ONLY and not isinstance(value, (six.string_types, int)):
+        elif self.type == self.ID_ONLY and not inlined and not isinstance(value, (six.string_types, int)):
             raise ValueError(
                 "Expected nested resource to be a string or int, got type {0}'".format(value.__class__.__name__)
             )
 
         if self.type == self.FULL_OBJECT:
-            nested = self.resource_class()
+            nested = self.resource_class(session=resource._session)
             nested.populate_field_values(value)
 
             if self.relative_path:
@@ -242,10 +298,43 @@ class NestedResourceField(Field):
 
             return nested
         else:
-            return self.resource_class.get(self.get_uri(value, resource._url), session=resource._session)
+            nested = self.resource_class.get(
+                self.get_uri(value, resource._url), session=resource._session,
+                expand=urls.get_expand_paths(expand) if expand else None
+            )
+
+            # Kept so the parent can be serialized without loading the nested resource
+            nested.__dict__['_nested_id'] = self.get_id(value)
+
+            # Nested resources created within a deadline (e.g., of the parent's `get()`) are first loaded within it too
+            deadline = deadlines.current()
+            if deadline is not None:
+                nested.__dict__['_deadline'] = deadline
+            return nested
+
+    def _get_id(self, obj):
+        d = obj.__dict__
+        if not d.get('_populated_field_values', True) and '_nested_id' in d:
+            return d['_nested_id']
+
+        for field in obj._meta.fields:
+            if field.name == self.id_field:
+                return field.to_value(getattr(obj, field._attr_name), obj)
+
+        raise ValueError("Nested resource has no field named '{0}'".format(self.id_field))
 
     def to_value(self, obj, resource):
-        raise NotImplementedError('Serializing nested resources is not yet supported')
+        """Serializes the nested resource as it is represented by the parent resource (id, partial or full object)"""
+
+        if obj is None:
+            return obj
+
+        if self.type == self.ID_ONLY:
+            return self._get_id(obj)
+        elif self.type == self.PARTIAL_OBJECT:
+            return {self.id_field: self._get_id(obj)}
+
+        return {x.name: x.to_value(getattr(obj, x._attr_name), obj) for x in obj._meta.fields}
 
 
 class ToOneField(NestedResourceField):
@@ -265,12 +354,65 @@ class ToManyField(NestedResourceField):
 
     def to_python(self, value, resource):
         if value is None:
-            return []
+            return ResourceCollection()
 
         if not isinstance(value, list):
             raise ValueError("Expected a list for 'to many' value, got '{0}'".format(value.__class__.__name__))
 
-        return [super(ToManyField, self).to_python(x, resource) for x in value]
+        nested = ResourceCollection(super(ToManyField, self).to_python(x, resource) for x in value)
+
+        if self.bulk_path and self.type != self.FULL_OBJECT:
+            # Resources expanded by the server are already loaded
+            pending = [(x, self.get_id(y)) for x, y in zip(nested, value) if not x._populated_field_values]
+            resources = [x[0] for x in pending]
+            ids = [x[1] for x in pending]
+
+            for i in range(0, len(resources), self.bulk_size):
+                loader = BulkLoader(self, resources[i:i + self.bulk_size], ids[i:i + self.bulk_size], resource)
+                for x in loader.resources:
+                    x._bulk_loader = loader
+
+        return nested
 
     def to_value(self, obj, resource):
-        raise NotImplementedError('Serializing nested resources is not yet supported')
+        if obj is None:
+            return []
+
+        return [super(ToManyField, self).to_value(x, resource) for x in obj]
+
+
+class BulkLoader(object):
+    """
+    Loads a group of nested resources with a single request to a bulk endpoint (see `NestedResourceField.bulk_path`).
+    The load is triggered by the first attribute access on any resource in the group. Resources missing from the bulk
+    response are left to load individually.
+    """
+
+    def __init__(self, field, resources, ids, parent):
+        self.field = field
+        self.resources = resources
+        self.ids = ids
+        self.url = field.get_bulk_uri(ids, parent._url)
+        self.session = parent._session
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self.loaded:
+                return
+
+            profile_path = '{0} (bulk)'.format(profiling.get_path(self.resources[0])) if profiling.is_active() else None
+            data, _ = loading.fetch(self.session, self.field.resource_class, self.url, profile_path=profile_path)
+
+            items = data[self.field.bulk_key] if self.field.bulk_key else data
+            items_by_id = {six.text_type(x.get(self.field.id_field)): x for x in items}
+
+            for resource_id, resource in zip(self.ids, self.resources):
+                resource._bulk_loader = None
+
+                item = items_by_id.get(six.text_type(resource_id))
+                if item is not None:
+                    resource.populate_field_values(item)
+
+            self.loaded = True
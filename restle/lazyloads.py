@@ -0,0 +1,154 @@
+import os
+import sys
+import threading
+import warnings
+
+import six
+
+from restle.exceptions import ImplicitLoadException, ImplicitLoadWarning
+
+WARN = 'warn'
+RAISE = 'raise'
+
+_active = []
+_active_lock = threading.Lock()
+_restle_dir = os.path.dirname(os.path.abspath(__file__))
+_internal_files = {}
+
+
+def is_active():
+    """Returns True if a detector or strict mode is active. Hooks check this first, so detection costs nothing."""
+
+    return bool(_active)
+
+
+def _is_internal(filename):
+    internal = _internal_files.get(filename)
+    if internal is None:
+        internal = _internal_files[filename] = os.path.dirname(os.path.abspath(filename)) == _restle_dir
+    return internal
+
+
+def get_call_site():
+    """Returns the (filename, line number) of the code outside of restle which caused the current load"""
+
+    frame = sys._getframe(1)
+    while frame is not None and _is_internal(frame.f_code.co_filename):
+        frame = frame.f_back
+
+    if frame is None:
+        return '<unknown>', 0
+    return frame.f_code.co_filename, frame.f_lineno
+
+
+def record(resource, name):
+    """Records an implicit load, triggered by accessing an attribute of a resource which hasn't been loaded yet"""
+
+    site = get_call_site()
+    for recorder in list(_active):
+        recorder.record(resource, name, site)
+
+
+class _Recorder(object):
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        with _active_lock:
+            _active.append(self)
+
+    def stop(self):
+        with _active_lock:
+            if self in _active:
+                _active.remove(self)
+
+
+class Detector(_Recorder):
+    """
+    Counts implicit loads (triggered by attribute access on lazy resources) per call site and per resource class while
+    active, and warns or raises when more than `threshold` loads are triggered from the same call site. Many loads from
+    one line of code usually mean resources are being loaded one at a time in a loop (the N+1 problem), which can be
+    avoided with `prefetch()` or a bulk endpoint. Use as a context manager, or call `start()` and `stop()`.
+
+    Loads on all threads are counted.
+    """
+
+    def __init__(self, threshold=10, action=WARN):
+        """
+        :param action: Either 'warn' (an `ImplicitLoadWarning` is issued once per call site) or 'raise' (an
+        `ImplicitLoadException` is raised instead of loading)
+        """
+
+        if action not in (WARN, RAISE):
+            raise ValueError("Unsupported action: '{0}'".format(action))
+
+        self.threshold = threshold
+        self.action = action
+        self.sites = {}
+        self.classes = {}
+        self._warned = set()
+        self._lock = threading.Lock()
+
+    def record(self, resource, name, site):
+        class_name = resource.__class__.__name__
+
+        with self._lock:
+            count = self.sites[site] = self.sites.get(site, 0) + 1
+            self.classes[class_name] = self.classes.get(class_name, 0) + 1
+
+            if count <= self.threshold or (self.action == WARN and site in self._warned):
+                return
+            self._warned.add(site)
+
+        message = '{0} implicit loads of {1} (accessing {2}) from {3}:{4}. Use prefetch() to load them together.'
+        message = message.format(count, class_name, name, site[0], site[1])
+
+        if self.action == RAISE:
+            raise ImplicitLoadException(message)
+        warnings.warn_explicit(message, ImplicitLoadWarning, site[0], site[1])
+
+    def report(self):
+        """Returns the number of implicit loads per call site and per resource class, most first"""
+
+        lines = ['{0:<70} {1:>8}'.format('Call site', 'Loads')]
+        for (filename, lineno), count in sorted(six.iteritems(self.sites), key=lambda x: x[1], reverse=True):
+            lines.append('{0:<70} {1:>8}'.format('{0}:{1}'.format(filename, lineno), count))
+
+        lines.append('')
+        lines.append('{0:<70} {1:>8}'.format('Resource class', 'Loads'))
+        for class_name, count in sorted(six.iteritems(self.classes), key=lambda x: x[1], reverse=True):
+            lines.append('{0:<70} {1:>8}'.format(class_name, count))
+
+        return '\n'.join(lines)
+
+
+class strict(_Recorder):
+    """
+    Context manager which makes implicit loads raise `ImplicitLoadException`, on all threads, so that only explicit
+    loads (`Resource.get(..., lazy=False)`, `Resource.load()`, `prefetch()` and refreshes) perform I/O. Useful in tests,
+    to catch N+1 patterns before they reach production.
+    """
+
+    def record(self, resource, name, site):
+        raise ImplicitLoadException(
+            'Implicit load of {0} (accessing {1}) from {2}:{3} in strict mode. Use load() or prefetch().'.format(
+                resource.__class__.__name__, name, site[0], site[1]
+            )
+        )
+
+
+_strict = strict()
+
+
+def set_strict(enabled):
+    """Enables or disables strict mode (see `strict`) for the whole process, e.g., for a test suite"""
+
+    with _active_lock:
+        if enabled and _strict not in _active:
+            _active.append(_strict)
+        elif not enabled and _strict in _active:
+            _active.remove(_strict)
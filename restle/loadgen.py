@@ -0,0 +1,288 @@
+"""
+Generates load using resource classes declared with restle, e.g.:
+
+    restle-load myproject.clients scenario.json --concurrency 16 --duration 30
+
+The scenario is a JSON file describing the steps run by each iteration:
+
+    {
+        "base_url": "http://example.com/api/",
+        "steps": [
+            {"resource": "MessageListClient", "url": "messages/", "access": ["objects.*.message"]},
+            {"resource": "MessageClient", "url": "messages/2389/", "action": "mark_read", "params": {}}
+        ],
+        "responses": {
+            "/api/messages/": {"body": {"objects": [2389]}},
+            "/api/messages/2389/": {"body": {"id": 2389, "message": "Hello!"}}
+        }
+    }
+
+Each step loads a resource (`Resource.get`), accesses attributes (`*` iterates over a list, triggering lazy loads of
+nested resources), and optionally calls an action. Requests are sent to `base_url`, unless `--stub` is given, in which
+case a local server answers them with `responses`, or `--cassette` is given, in which case they're answered from a
+recorded cassette (see `restle.replay`).
+"""
+
+import argparse
+import importlib
+import json
+import sys
+import threading
+import time
+
+import six
+
+from restle import profiling, replay, sessions
+
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(int(len(values) * percent / 100.0), len(values) - 1)]
+
+
+def get_resource_class(module, name):
+    """Looks up a (possibly nested) class by its dotted name within a module"""
+
+    obj = module
+    for part in name.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def access(obj, names):
+    """Accesses a path of attributes, e.g., ['objects', '*', 'message']"""
+
+    if not names:
+        return
+    elif names[0] == '*':
+        for item in obj:
+            access(item, names[1:])
+    else:
+        access(getattr(obj, names[0]), names[1:])
+
+
+class StubServer(object):
+    """A local HTTP server which answers requests with the canned responses of a scenario"""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+        class Handler(six.moves.BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # Headers and body are written separately
+
+            def handle_request(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+
+                response = responses.get(self.path) or responses.get(self.path.split('?', 1)[0])
+                if response is None:
+                    response = {'status': 404, 'body': ''}
+
+                body = response.get('body', '')
+                if not isinstance(body, six.string_types):
+                    body = json.dumps(body)
+                body = body.encode('utf-8')
+
+                self.send_response(response.get('status', 200))
+                for key, value in six.iteritems(response.get('headers', {'Content-Type': 'application/json'})):
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = handle_request
+
+            def log_message(self, *args):
+                pass
+
+        class Server(six.moves.socketserver.ThreadingMixIn, six.moves.BaseHTTPServer.HTTPServer):
+            daemon_threads = True
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), name='restle-stub-server')
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class LoadGenerator(object):
+    """Runs the steps of a scenario repeatedly from several threads, recording the latency and outcome of each step"""
+
+    def __init__(self, module, scenario, base_url=None, concurrency=8, cassette=None, latency=0):
+        """
+        :param cassette: Path of a cassette to answer requests from, instead of the network
+        :param latency: Simulated latency of replayed responses, in seconds
+        """
+
+        self.module = module
+        self.steps = scenario['steps']
+        self.base_url = base_url or scenario.get('base_url', '')
+        self.concurrency = concurrency
+        self.cassette = cassette
+        self.latency = latency
+
+        self.latencies = {}
+        self.errors = {}
+        self.profiler = profiling.Profiler()
+        self.elapsed = 0
+        self._lock = threading.Lock()
+
+    def get_session(self):
+        session = sessions.create_session()
+        if self.cassette:
+            replay.replay(session, self.cassette, latency=self.latency)
+        return session
+
+    def get_step_name(self, i, step):
+        return step.get('name') or '{0}: {1}'.format(i + 1, step.get('action') or step['resource'])
+
+    def run_step(self, step, session):
+        resource_class = get_resource_class(self.module, step['resource'])
+        url = six.moves.urllib_parse.urljoin(self.base_url, step['url'])
+
+        resource = resource_class.get(url, session=session, lazy=False, expand=step.get('expand'))
+        for path in step.get('access', []):
+            access(resource, path.split('.'))
+
+        if step.get('action'):
+            getattr(resource, step['action'])(**step.get('params', {}))
+
+    def run_iteration(self, session):
+        for i, step in enumerate(self.steps):
+            name = self.get_step_name(i, step)
+            start = time.time()
+            error = None
+
+            try:
+                self.run_step(step, session)
+            except Exception as e:
+                error = e
+
+            with self._lock:
+                self.latencies.setdefault(name, []).append(time.time() - start)
+                if error is not None:
+                    self.errors.setdefault(name, []).append(error)
+
+    def run(self, iterations=None, duration=None):
+        """Runs the scenario `iterations` times in total, or repeatedly for `duration` seconds"""
+
+        if iterations is None and duration is None:
+            iterations = self.concurrency
+
+        remaining = [iterations]
+        end = time.time() + duration if duration is not None else None
+
+        def worker():
+            session = self.get_session()
+            try:
+                while True:
+                    if end is not None:
+                        if time.time() >= end:
+                            break
+                    else:
+                        with self._lock:
+                            if remaining[0] <= 0:
+                                break
+                            remaining[0] -= 1
+
+                    self.run_iteration(session)
+            finally:
+                session.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.concurrency)]
+        start = time.time()
+
+        with self.profiler:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.elapsed = time.time() - start
+
+    def report(self):
+        total = sum(len(x) for x in six.itervalues(self.latencies))
+        failed = sum(len(x) for x in six.itervalues(self.errors))
+
+        lines = [
+            'Steps: {0} in {1:.2f}s ({2:.1f}/s), errors: {3} ({4:.2%})'.format(
+                total, self.elapsed, total / self.elapsed if self.elapsed else 0, failed,
+                float(failed) / total if total else 0
+            ),
+            '',
+            '{0:<40} {1:>8} {2:>8} {3:>10} {4:>10} {5:>10}'.format(
+                'Step', 'Count', 'Errors', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)'
+            )
+        ]
+
+        for name in sorted(self.latencies):
+            latencies = self.latencies[name]
+            lines.append('{0:<40} {1:>8} {2:>8} {3:>10.2f} {4:>10.2f} {5:>10.2f}'.format(
+                name, len(latencies), len(self.errors.get(name, [])), percentile(latencies, 50) * 1000,
+                percentile(latencies, 95) * 1000, percentile(latencies, 99) * 1000
+            ))
+
+        lines.append('')
+        lines.append('Time by phase (summed over threads):')
+        for phase, seconds in sorted(six.iteritems(self.profiler.get_phases())):
+            lines.append('  {0:<12} {1:>10.3f}s'.format(phase, seconds))
+
+        for name in sorted(self.errors):
+            lines.append('')
+            lines.append('First error in {0}: {1!r}'.format(name, self.errors[name][0]))
+
+        return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generates load using resources declared with restle')
+    parser.add_argument('module', help='Module containing the resource classes, e.g., myproject.clients')
+    parser.add_argument('scenario', help='Path of the scenario (JSON) file')
+    parser.add_argument('--concurrency', type=int, default=8, help='Number of threads')
+    parser.add_argument('--iterations', type=int, help='Total number of times to run the scenario')
+    parser.add_argument('--duration', type=float, help='Run the scenario repeatedly for this many seconds')
+    parser.add_argument('--base-url', help="Overrides the scenario's base_url")
+    parser.add_argument('--stub', action='store_true', help="Answer requests with the scenario's responses")
+    parser.add_argument('--cassette', help='Answer requests from a recorded cassette')
+    parser.add_argument('--latency', type=float, default=0, help='Simulated latency of replayed responses')
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(args.module)
+    with open(args.scenario) as f:
+        scenario = json.load(f)
+
+    server = None
+    base_url = args.base_url
+
+    if args.stub:
+        server = StubServer(scenario.get('responses', {})).start()
+        path = six.moves.urllib_parse.urlsplit(scenario.get('base_url', '/')).path or '/'
+        base_url = server.url + path
+
+    try:
+        generator = LoadGenerator(
+            module, scenario, base_url=base_url, concurrency=args.concurrency, cassette=args.cassette,
+            latency=args.latency
+        )
+        generator.run(iterations=args.iterations, duration=args.duration)
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(generator.report())
+    return 1 if generator.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+from restle import deadlines, profiling, urls
+from restle.compression import get_accept_encoding, read_response
+from restle.exceptions import HTTPException, NotFoundException
+
+# Request headers sent to make a load conditional, and the response headers they're taken from
+VALIDATORS = (('If-None-Match', 'ETag'), ('If-Modified-Since', 'Last-Modified'))
+
+
+def get_validators(response):
+    """Returns the headers which make a later request for the same resource conditional (see `fetch`)"""
+
+    return {k: response.headers[v] for k, v in VALIDATORS if v in response.headers}
+
+
+def fetch(session, resource_class, url, params=None, validators=None, use_cache=True, profile_path=None):
+    """
+    Requests and deserializes data for a resource class. All loads (of resources, bulk requests and collection pages)
+    go through here, so they behave the same way: the URL is canonicalized along with `Meta.get_parameters` and
+    `params`, the shared cache (`Meta.cache`) is used, the request is bounded by the current deadline and
+    `Meta.timeout` (or `Meta.host_timeouts`) and hedged according to `Meta.hedge`, and the response body is
+    decompressed as it's deserialized.
+
+    :param validators: Headers (see `get_validators`, possibly none) which make the request conditional. Conditional
+    requests bypass the cache, but update it.
+    :param use_cache: If False, the cache is neither read nor updated
+    :param profile_path: The profiling path of the load (see `restle.profiling`), if profiling is active
+    :return: A tuple of (data, response). The data is None if a conditional request reports that nothing changed, and
+    the response is None if the data came from the cache. The response's `compression_stats` are set.
+    """
+
+    meta = resource_class._meta
+    query = meta.get_parameters.copy()
+    query.update(params or {})
+
+    key = urls.get_request_key(url, query, meta.get_method, meta.force_https)
+    cache = meta.cache if use_cache else None
+
+    if cache is not None and validators is None:
+        data = cache.get(key.hash)
+        if data is not None:
+            return data, None
+
+    headers = {'Accept-Encoding': meta.accept_encoding or get_accept_encoding()}
+    headers.update(validators or {})
+
+    if profile_path is not None:
+        profiling.enter('{0} {1}'.format(key.method, profile_path))
+
+    try:
+        deadline = deadlines.current()
+        r = deadlines.request(
+            session, key.method, key.url, deadline, meta.hedge, headers=headers, stream=True,
+            timeout=deadlines.get_timeout(key.url, meta.timeout, meta.host_timeouts, deadline)
+        )
+
+        if r.status_code == 304 and validators is not None:
+            r.close()
+            return None, r
+        elif r.status_code == 404:
+            r.close()
+            raise NotFoundException('Server returned 404 Not Found for the URL {0}'.format(key.url))
+        elif not 200 <= r.status_code < 400:
+            r.close()
+            raise HTTPException('Server returned {0} ({1})'.format(r.status_code, r.reason), r)
+
+        data, stats = read_response(r, meta.deserializer)
+        if cache is not None:
+            cache.set(key.hash, data, meta.cache_ttl)
+    finally:
+        if profile_path is not None:
+            profiling.exit(profiling.FETCH, profile_path)
+
+    if profile_path is not None:
+        profiling.record_read(resource_class.__name__, stats)
+
+    return data, r
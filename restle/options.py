@@ -2,9 +2,30 @@ from restle.serializers import JSONSerializer, URLSerializer
 
 OPTION_NAMES = (
     'case_sensitive_fields', 'match_fuzzy_keys', 'force_https', 'get_method', 'get_parameters', 'deserializer',
-    'serializer'
+    'serializer', 'accept_encoding', 'save_method', 'json_patch', 'timeout', 'host_timeouts', 'hedge',
+    'expand_param', 'cache', 'cache_ttl'
 )
 
+# Serializers are stateless, so the defaults are shared by all resource classes
+DEFAULT_DESERIALIZER = JSONSerializer()
+DEFAULT_SERIALIZER = URLSerializer()
+
+
+def get_meta_options(meta):
+    """Returns the options set by a Meta class, raising TypeError if it contains invalid attributes"""
+
+    if not meta:
+        return {}
+
+    meta_attrs = {k: v for k, v in meta.__dict__.items() if not k.startswith('_')}
+    options = {k: meta_attrs.pop(k) for k in OPTION_NAMES if k in meta_attrs}
+
+    # Check for invalid attributes
+    if meta_attrs:
+        raise TypeError('Meta class contains invalid attribute(s): {0}'.format(', '.join(meta_attrs.keys())))
+
+    return options
+
 
 class ResourceOptions(object):
     def __init__(self, meta):
@@ -13,30 +34,28 @@ class ResourceOptions(object):
         self.force_https = False
         self.get_method = 'GET'
         self.get_parameters = {}
-        self.deserializer = JSONSerializer()
-        self.serializer = URLSerializer()
+        self.deserializer = DEFAULT_DESERIALIZER
+        self.serializer = DEFAULT_SERIALIZER
+        self.accept_encoding = None  # Determined on first request, from the compression libraries installed
+        self.save_method = 'PATCH'
+        self.json_patch = False
+        self.timeout = None  # Seconds, or a (connect, read) tuple
+        self.host_timeouts = {}  # Timeouts for specific hosts (e.g., 'api.example.com:8080')
+        self.hedge = None
+        self.expand_param = 'expand'
+        self.cache = None  # A `restle.cache.SharedCache`
+        self.cache_ttl = 60
 
         self.fields = []
+        self.field_attr_names = frozenset()
+        self.frozen_class = None
         self.actions = []
         self.meta = meta
 
     def contribute_to_class(self, cls, name):
         cls._meta = self
 
-        if self.meta:
-            meta_attrs = self.meta.__dict__.copy()
-
-            # Remove private attributes
-            for key in self.meta.__dict__:
-                if key.startswith('_'):
-                    del meta_attrs[key]
-
-            for name in OPTION_NAMES:
-                if name in meta_attrs:
-                    setattr(self, name, meta_attrs.pop(name))
-
-            # Check for invalid attributes
-            if meta_attrs:
-                raise TypeError('Meta class contains invalid attribute(s): {0}'.format(', '.join(meta_attrs.keys())))
+        for name, value in get_meta_options(self.meta).items():
+            setattr(self, name, value)
 
-            del self.meta
+        del self.meta
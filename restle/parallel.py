@@ -0,0 +1,83 @@
+import multiprocessing
+
+from restle import sessions
+from restle.collection import ResourceCollection
+from restle.resources import Resource
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _hydrate_chunk(args):
+    """Worker function: converts a chunk of deserialized items to resources (or records of field values)"""
+
+    resource_class, items, url, strict, records = args
+    results = []
+
+    for item in items:
+        resource = resource_class(session=sessions.get_default_session())
+        resource._url = url
+        resource._strict = strict
+        resource.populate_field_values(item)
+
+        if records:
+            results.append({x._attr_name: getattr(resource, x._attr_name) for x in resource_class._meta.fields})
+        else:
+            results.append(resource)
+
+    return results
+
+
+def _attach_session(value, session):
+    if isinstance(value, Resource):
+        value._session = session
+        for field in value._meta.fields:
+            _attach_session(value.__dict__.get(field._attr_name), session)
+    elif isinstance(value, list):
+        for item in value:
+            _attach_session(item, session)
+
+
+def iter_hydrate(resource_class, items, url=None, strict=True, records=False, session=None, processes=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, pool=None):
+    """
+    Converts a list of deserialized items to resources using a pool of worker processes, yielding them in order as
+    each chunk completes. The resource class (and any classes it nests) must be importable by the workers, and field
+    values must be picklable.
+
+    :param url: Base URL for the resources, used to construct the URIs of nested resources
+    :param records: If True, yields dictionaries of field values rather than resource instances
+    :param session: Session to attach to the resulting resources (and their nested resources). If not provided, the
+    shared default session is used.
+    :param processes: Number of worker processes. Defaults to the number of CPUs.
+    :param chunk_size: Number of items converted by a worker at a time
+    :param pool: An existing `multiprocessing.Pool` to use instead of creating one
+    """
+
+    chunks = [(resource_class, items[i:i + chunk_size], url, strict, records) for i in range(0, len(items), chunk_size)]
+
+    if len(chunks) <= 1:
+        # Not worth the overhead of a process pool
+        results = (_hydrate_chunk(x) for x in chunks)
+        owns_pool = False
+    else:
+        owns_pool = pool is None
+        if owns_pool:
+            pool = multiprocessing.Pool(processes)
+        results = pool.imap(_hydrate_chunk, chunks)
+
+    try:
+        for chunk in results:
+            for result in chunk:
+                if not records and session is not None:
+                    _attach_session(result, session)
+                yield result
+    finally:
+        if owns_pool:
+            pool.terminate()
+
+
+def hydrate(resource_class, items, **kwargs):
+    """Same as `iter_hydrate`, but returns a `ResourceCollection` (or a list, for records)"""
+
+    results = iter_hydrate(resource_class, items, **kwargs)
+    return list(results) if kwargs.get('records') else ResourceCollection(results)
@@ -0,0 +1,170 @@
+import threading
+import time
+
+import six
+
+FIELD = 'field'
+FETCH = 'fetch'
+
+_active = []
+_active_lock = threading.Lock()
+_local = threading.local()
+
+# A monotonic, high resolution clock where available (Python 3.3+)
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+def is_active():
+    """Returns True if any profiler is recording. Hooks check this first, so profiling costs nothing when disabled."""
+
+    return bool(_active)
+
+
+def _get_stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def enter(frame):
+    """Starts timing a frame (e.g., 'MessageClient.message') nested within the current frame of this thread"""
+
+    _get_stack().append([frame, _clock(), 0.0])
+
+
+def exit(kind, key):
+    """Stops timing the current frame, and records it with every active profiler"""
+
+    stack = _get_stack()
+    frame, start, children = stack.pop()
+    elapsed = _clock() - start
+
+    if stack:
+        stack[-1][2] += elapsed
+
+    path = tuple(x[0] for x in stack) + (frame,)
+
+    for profiler in list(_active):
+        profiler.record(kind, key, elapsed, path, elapsed - children)
+
+
+def record_read(resource_class, stats):
+    """Records the size of a response body, and the time spent reading and deserializing it (see `read_response`)"""
+
+    for profiler in list(_active):
+        profiler.record_read(resource_class, stats.content_bytes, stats.elapsed)
+
+
+def get_path(resource):
+    """Returns the nested path by which a resource was reached, e.g., 'MessageListClient.messages'"""
+
+    return resource.__dict__.get('_profile_path') or resource.__class__.__name__
+
+
+def tag(value, path):
+    """Records the nested path of resources created by a field, so that their fetches are attributed to it"""
+
+    for item in value if isinstance(value, list) else [value]:
+        if hasattr(item, '_meta') and '_profile_path' not in item.__dict__:
+            item.__dict__['_profile_path'] = path
+
+
+class Profiler(object):
+    """
+    Records the time spent converting each field (`Field.to_python`), the number and latency of requests made for
+    each nested resource path, and the number of bytes parsed for each resource class, while active. Use as a context
+    manager, or call `start()` and `stop()`.
+
+    Field times include the time spent converting nested fields. The collapsed-stack output (see `dump_collapsed`)
+    attributes each frame's own time, and can be rendered with flame graph tools.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.fetches = {}
+        self.bytes = {}
+        self.read_times = {}
+        self.stacks = {}
+        self.hydrate_time = 0.0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        with _active_lock:
+            _active.append(self)
+
+    def stop(self):
+        with _active_lock:
+            if self in _active:
+                _active.remove(self)
+
+    def record(self, kind, key, elapsed, path, own_time):
+        stats = self.fields if kind == FIELD else self.fetches
+
+        with self._lock:
+            entry = stats.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            self.stacks[path] = self.stacks.get(path, 0.0) + own_time
+
+            if kind == FIELD:
+                self.hydrate_time += own_time
+
+    def record_read(self, resource_class, num_bytes, elapsed):
+        with self._lock:
+            entry = self.bytes.setdefault(resource_class, [0, 0])
+            entry[0] += 1
+            entry[1] += num_bytes
+            self.read_times[resource_class] = self.read_times.get(resource_class, 0.0) + elapsed
+
+    def get_phases(self):
+        """
+        Splits the recorded time into phases: 'network' (waiting for responses), 'deserialize' (reading and parsing
+        response bodies) and 'hydrate' (converting field values).
+        """
+
+        fetch_time = sum(x[1] for x in six.itervalues(self.fetches))
+        read_time = sum(six.itervalues(self.read_times))
+
+        return {'network': max(fetch_time - read_time, 0), 'deserialize': read_time, 'hydrate': self.hydrate_time}
+
+    def get_rows(self):
+        """Returns (kind, name, calls, total seconds) for each field and fetch, slowest first"""
+
+        rows = [(FIELD, k, v[0], v[1]) for k, v in six.iteritems(self.fields)]
+        rows += [(FETCH, k, v[0], v[1]) for k, v in six.iteritems(self.fetches)]
+        return sorted(rows, key=lambda x: x[3], reverse=True)
+
+    def report(self, limit=None):
+        """Returns the recorded timings (and bytes parsed per resource class) as a table"""
+
+        lines = ['{0:<6} {1:<50} {2:>8} {3:>12} {4:>10}'.format('Kind', 'Name', 'Calls', 'Total (ms)', 'Mean (ms)')]
+
+        for kind, name, calls, total in self.get_rows()[:limit]:
+            lines.append('{0:<6} {1:<50} {2:>8} {3:>12.3f} {4:>10.3f}'.format(
+                kind, name, calls, total * 1000, total * 1000 / calls
+            ))
+
+        if self.bytes:
+            lines.append('')
+            lines.append('{0:<57} {1:>8} {2:>12}'.format('Resource class', 'Loads', 'Bytes'))
+            for name, (loads, num_bytes) in sorted(six.iteritems(self.bytes), key=lambda x: x[1][1], reverse=True):
+                lines.append('{0:<57} {1:>8} {2:>12}'.format(name, loads, num_bytes))
+
+        return '\n'.join(lines)
+
+    def dump_collapsed(self, f):
+        """
+        Writes the recorded stacks in collapsed format (one 'frame;frame;frame microseconds' line per stack), as used
+        by flame graph tools.
+        """
+
+        for path, own_time in sorted(six.iteritems(self.stacks)):
+            f.write('{0} {1}\n'.format(';'.join(path), int(round(own_time * 1000000))))
@@ -0,0 +1,206 @@
+import base64
+import datetime
+import io
+import json
+import threading
+import time
+
+import six
+from requests import Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from restle.exceptions import ReplayException
+
+# Headers which describe the wire format of the recorded response rather than its content
+EXCLUDED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+def _encode_body(body):
+    if body is None:
+        return None
+    if isinstance(body, six.text_type):
+        body = body.encode('utf-8')
+    elif not isinstance(body, six.binary_type):
+        raise ReplayException('Cannot record streamed request bodies')
+
+    return base64.b64encode(body).decode('ascii')
+
+
+class Cassette(object):
+    """A collection of recorded HTTP exchanges, stored as a JSON file"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.interactions = []
+        self._index = {}
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(request):
+        return request['method'].upper(), request['url'], request['body']
+
+    def _add(self, interaction):
+        self.interactions.append(interaction)
+        self._index.setdefault(self.get_key(interaction['request']), []).append(interaction['response'])
+
+    def load(self):
+        with io.open(self.path, 'r', encoding='utf-8') as f:
+            interactions = json.load(f)['interactions']
+
+        self.interactions = []
+        self._index = {}
+        self._positions = {}
+        for interaction in interactions:
+            self._add(interaction)
+
+        return self
+
+    def save(self):
+        with io.open(self.path, 'w', encoding='utf-8') as f:
+            f.write(six.text_type(json.dumps({'interactions': self.interactions}, indent=2)))
+
+    def record(self, request, response, content):
+        interaction = {
+            'request': {'method': request.method, 'url': request.url, 'body': _encode_body(request.body)},
+            'response': {
+                'status_code': response.status_code,
+                'reason': response.reason,
+                'headers': {k: v for k, v in six.iteritems(response.headers) if k.lower() not in EXCLUDED_HEADERS},
+                'body': _encode_body(content),
+                'elapsed': response.elapsed.total_seconds()
+            }
+        }
+
+        with self._lock:
+            self._add(interaction)
+
+    def find(self, request):
+        """
+        Returns the recorded response for a request. Repeated identical requests are answered in the order they were
+        recorded, with the last response repeating once they're exhausted.
+        """
+
+        key = self.get_key({'method': request.method, 'url': request.url, 'body': _encode_body(request.body)})
+        matches = self._index.get(key)
+
+        if not matches:
+            raise ReplayException('No recorded response for {0} {1}'.format(request.method, request.url))
+
+        with self._lock:
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+
+        return matches[min(position, len(matches) - 1)]
+
+
+class ThrottledReader(io.BytesIO):
+    """Simulates limited bandwidth (in bytes per second) when reading a replayed response body"""
+
+    def __init__(self, content, bandwidth):
+        super(ThrottledReader, self).__init__(content)
+        self.bandwidth = bandwidth
+
+    def read(self, size=-1):
+        data = super(ThrottledReader, self).read(size)
+        if data:
+            time.sleep(len(data) / float(self.bandwidth))
+
+        return data
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport adapter which performs real requests and records them to a cassette"""
+
+    def __init__(self, cassette, *args, **kwargs):
+        super(RecordingAdapter, self).__init__(*args, **kwargs)
+        self.cassette = cassette
+
+    def send(self, request, stream=False, **kwargs):
+        response = super(RecordingAdapter, self).send(request, stream=stream, **kwargs)
+        content = response.content
+        self.cassette.record(request, response, content)
+
+        # The body has been consumed (and decompressed), so hand the caller a fresh stream over the decoded content
+        for header in EXCLUDED_HEADERS:
+            response.headers.pop(header, None)
+        response.raw = io.BytesIO(content)
+        response._content = False
+        response._content_consumed = False
+
+        return response
+
+    def close(self):
+        super(RecordingAdapter, self).close()
+
+        if self.cassette.path:
+            self.cassette.save()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter which answers requests from a cassette, without any network I/O"""
+
+    def __init__(self, cassette, latency=0, bandwidth=None):
+        """
+        :param latency: Simulated delay (in seconds) before each response, or a function which takes the request and
+        returns the delay
+        :param bandwidth: Simulated transfer rate of response bodies, in bytes per second
+        """
+
+        super(ReplayAdapter, self).__init__()
+
+        self.cassette = cassette
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        recorded = self.cassette.find(request)
+
+        latency = self.latency(request) if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+
+        content = base64.b64decode(recorded['body']) if recorded['body'] else b''
+
+        response = Response()
+        response.status_code = recorded['status_code']
+        response.reason = recorded['reason']
+        response.headers = CaseInsensitiveDict(recorded['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = ThrottledReader(content, self.bandwidth) if self.bandwidth else io.BytesIO(content)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = datetime.timedelta(seconds=latency or 0)
+
+        if not stream:
+            response.content  # Consume the body, as HTTPAdapter does for non-streamed requests
+
+        return response
+
+    def close(self):
+        pass
+
+
+def record(session, path):
+    """Records all requests made through `session` to a cassette file, which is written when the session is closed"""
+
+    cassette = Cassette(path)
+    adapter = RecordingAdapter(cassette)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return cassette
+
+
+def replay(session, path, latency=0, bandwidth=None):
+    """Answers all requests made through `session` from a cassette file"""
+
+    cassette = Cassette(path).load()
+    adapter = ReplayAdapter(cassette, latency, bandwidth)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return cassette
@@ -1,18 +1,51 @@
 import copy
+import json
 import logging
+import operator
 import string
+import threading
 
 import six
-from requests import Session
 
+from restle import deadlines, lazyloads, loading, profiling, sessions, urls
+from restle.collection import ResourceCollection
 from restle.exceptions import NotFoundException, HTTPException, MissingFieldException
-from restle.options import ResourceOptions
+from restle.options import ResourceOptions, get_meta_options
 
 logger = logging.getLogger(__name__)
 
 ALPHANUMERIC = set(string.ascii_letters + string.digits)
 
 
+_prepare_lock = threading.RLock()
+
+try:
+    from pickle import PickleBuffer
+except ImportError:  # Python < 3.8
+    PickleBuffer = None
+
+# Binary field values at least this large are pickled out-of-band with protocol 5
+BINARY_TYPES = frozenset((bytes, bytearray))
+PICKLE_BUFFER_SIZE = 64 * 1024
+
+
+class LazyOptions(object):
+    """
+    Placeholder for `_meta` until a resource class is first used. Accessing it prepares the class (builds its
+    `ResourceOptions` and contributes its fields and actions), after which it's replaced with the real options.
+    """
+
+    def __init__(self):
+        self.options = None
+
+    def __get__(self, instance, owner):
+        # Other threads wait for preparation to complete, rather than seeing partially prepared options
+        with _prepare_lock:
+            if self.options is None:
+                owner._prepare(self)
+            return self.options
+
+
 class ResourceBase(type):
     """Resource metaclass"""
 
@@ -27,18 +60,38 @@ class ResourceBase(type):
 
         new_class = super_new(cls, name, bases, new_attrs)
         meta = attrs.pop('Meta', None)
-        new_class.add_to_class('_meta', ResourceOptions(meta))
+        get_meta_options(meta)  # Report invalid Meta attributes when the class is defined, not when it's used
 
+        # Fields and actions are contributed when the class is first used (see `_prepare`)
+        pending = []
         for name, value in attrs.items():
-            new_class.add_to_class(name, value)
+            if hasattr(value, 'contribute_to_class'):
+                pending.append((name, value))
+            else:
+                new_class.add_to_class(name, value)
 
-        field_names = set(x.name for x in new_class._meta.fields)
+        new_class._pending = (meta, pending)
+        new_class._meta = LazyOptions()
+
+        return new_class
 
-        for base in bases:
+    def _prepare(cls, lazy_options):
+        meta, pending = cls._pending
+        options = lazy_options.options = ResourceOptions(meta)
+
+        for name, value in pending:
+            cls.add_to_class(name, value)
+
+        field_names = set(x.name for x in options.fields)
+
+        for base in cls.__bases__:
             base_fields = [x for x in getattr(getattr(base, '_meta', None), 'fields', []) if x.name not in field_names]
-            new_class._meta.fields = base_fields + new_class._meta.fields
+            options.fields = base_fields + options.fields
 
-        return new_class
+        options.field_attr_names = frozenset(x._attr_name for x in options.fields)
+
+        cls.add_to_class('_meta', options)
+        del cls._pending
 
     def add_to_class(cls, name, value):
         if hasattr(value, 'contribute_to_class'):
@@ -48,51 +101,182 @@ class ResourceBase(type):
 
 
 class Resource(six.with_metaclass(ResourceBase)):
-    def __init__(self, **kwargs):
-        self._session = kwargs.pop('session', None)
-        self._url = None
-        self._params = None
-        self._strict = True
-        self._populated_field_values = True if kwargs else False
+    # Created per instance on first use, since most resources are never modified or observed
+    _dirty_fields = frozenset()
+    _observers = ()
 
-        if self._session is None:
-            self._session = Session()
+    def __init__(self, **kwargs):
+        session = kwargs.pop('session', None)
+
+        # Private state is written directly, bypassing __setattr__, since this runs for every resource created
+        self.__dict__.update({
+            '_session': session,
+            '_owns_session': session is None,
+            '_url': None,
+            '_params': None,
+            '_strict': True,
+            '_populated_field_values': bool(kwargs),
+            '_load_lock': threading.RLock(),
+            '_compression_stats': None,
+            '_raw_data': None,
+            '_validators': {},
+            '_bulk_loader': None,
+            '_expand': {}
+        })
+
+        if session is None:
+            self._session = sessions.create_session()
+        else:
+            sessions.track(session)
 
         for field in self._meta.fields:
             if field._attr_name in kwargs:
-                setattr(self, field._attr_name, kwargs.pop(field._attr_name))
-
-        def action_wrapper(fn):
-            def inner(*args, **kwargs):
-                return fn(self, *args, **kwargs)
-            return inner
+                self.__dict__[field._attr_name] = kwargs.pop(field._attr_name)
 
-        for action in self._meta.actions:
-            setattr(self, action._attr_name, action_wrapper(action))
+        self._bind_actions()
 
         if kwargs:
             raise TypeError('Resource received invalid keyword argument(s): {0}'.format(', '.join(kwargs.keys())))
 
-    def _load_resource(self):
-        """Load resource data from server"""
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
 
-        url = self._url
-        if self._params:
-            url += '?{0}'.format(six.moves.urllib_parse.urlencode(self._params))
+        # Writes to resources which haven't been loaded yet are tracked too, and kept when they're loaded
+        if name in self._meta.field_attr_names:
+            dirty_fields = self.__dict__.get('_dirty_fields')
+            if dirty_fields is None:
+                dirty_fields = self.__dict__['_dirty_fields'] = set()
+            dirty_fields.add(name)
 
-        r = getattr(self._session, self._meta.get_method.lower())(url)
+            if self._observers:
+                self._notify(set([name]))
 
-        if r.status_code == 404:
-            raise NotFoundException('Server returned 404 Not Found for the URL {0}'.format(self._url))
-        elif not 200 <= r.status_code < 400:
-            raise HTTPException('Server returned {0} ({1})'.format(r.status_code, r.reason), r)
+    def _add_observer(self, observer):
+        self.__dict__.setdefault('_observers', []).append(observer)
 
-        data = self._meta.deserializer.to_dict(r.text)
-        self.populate_field_values(data)
+    def _remove_observer(self, observer):
+        observers = self.__dict__.get('_observers')
+        if observers and observer in observers:
+            observers.remove(observer)
 
-    def populate_field_values(self, data):
-        """Load resource data and populate field values"""
+    def _notify(self, changed):
+        """Calls observers (e.g., collections indexing this resource) with the names of fields which changed"""
+
+        for observer in list(self._observers):
+            observer(self, changed)
 
+    def _bind_actions(self):
+        def action_wrapper(fn):
+            def inner(*args, **kwargs):
+                return fn(self, *args, **kwargs)
+            return inner
+
+        for action in self._meta.actions:
+            self.__dict__[action._attr_name] = action_wrapper(action)
+
+    def __reduce_ex__(self, protocol):
+        # Pickled as `cls.__new__(cls)` followed by `__setstate__`, so __init__ (which creates a session) isn't called
+        return six.moves.copyreg.__newobj__, (self.__class__,), self.__getstate__(protocol)
+
+    def __getstate__(self, protocol=2):
+        """
+        Returns the state to pickle: field values (in field order), the URL and query parameters, and the data needed
+        to refresh and save the resource. Sessions, locks, bound actions and other attributes are excluded, and no
+        loads are triggered. With protocol 5, large binary field values are pickled as buffers, which can be sent
+        out-of-band (they're restored as the buffer objects passed to `pickle.loads`).
+        """
+
+        d = self.__dict__
+        raw_data = d.get('_raw_data')
+        values = missing = None
+
+        if d.get('_populated_field_values'):
+            fields = self._meta.fields
+            values = [d.get(x._attr_name) for x in fields]
+
+            if None in values:
+                missing = tuple(x._attr_name for x in fields if x._attr_name not in d) or None
+
+            if protocol >= 5 and PickleBuffer is not None and not BINARY_TYPES.isdisjoint(map(type, values)):
+                # Values shared with the raw data are pickled once, as the same buffer
+                buffers = {}
+                values = [_to_pickle_buffer(x, buffers) for x in values]
+                if buffers and isinstance(raw_data, dict):
+                    raw_data = {k: buffers.get(id(v), v) for k, v in six.iteritems(raw_data)}
+
+            values = tuple(values)
+
+        return (
+            d.get('_url'), d.get('_params'), d.get('_strict', True), values, missing, raw_data,
+            d.get('_validators') or None, tuple(d.get('_dirty_fields', ())) or None, d.get('_expand') or None,
+            d.get('_nested_id')
+        )
+
+    def __setstate__(self, state):
+        d = self.__dict__
+
+        url, params, strict, values, missing, raw_data, validators, dirty_fields, expand, nested_id = state
+
+        d['_url'] = url
+        d['_params'] = params
+        d['_strict'] = strict
+        d['_populated_field_values'] = values is not None
+        d['_raw_data'] = raw_data
+        d['_validators'] = validators or {}
+        if dirty_fields:
+            d['_dirty_fields'] = set(dirty_fields)
+        d['_expand'] = expand or {}
+
+        if nested_id is not None:
+            d['_nested_id'] = nested_id
+
+        if values is not None:
+            d.update(zip((x._attr_name for x in self._meta.fields), values))
+            for name in missing or ():
+                del d[name]
+
+        d['_session'] = sessions.get_default_session()
+        d['_owns_session'] = False
+        d['_load_lock'] = threading.RLock()
+        d['_compression_stats'] = None
+        d['_bulk_loader'] = None
+        self._bind_actions()
+
+    def _load_resource(self, conditional=False):
+        """
+        Load resource data from server
+
+        :param conditional: If True, and the resource has already been loaded, validators from the previous response
+        (ETag, Last-Modified) are sent, and the response is not parsed if the server reports it hasn't changed.
+        :return: The attribute names of fields which changed
+        """
+
+        # Conditional loads are refreshes, so they bypass the cache (but update it)
+        validators = self._validators if conditional and self._populated_field_values else None
+        profile_path = profiling.get_path(self) if profiling.is_active() else None
+
+        data, r = loading.fetch(
+            self._session, self.__class__, self._url, self._params, validators=validators, profile_path=profile_path
+        )
+
+        if data is None:
+            return set()
+        elif r is not None:
+            self._validators = loading.get_validators(r)
+            self._compression_stats = r.compression_stats
+
+        return self.populate_field_values(data)
+
+    @property
+    def compression_stats(self):
+        """
+        Transfer statistics (a `CompressionStats`) of the last response body read for this resource, by a load, refresh
+        or action, or None
+        """
+
+        return self._compression_stats
+
+    def _normalize_keys(self, data):
         if not self._meta.case_sensitive_fields:
             data = {k.lower(): v for k, v in six.iteritems(data)}
 
@@ -100,14 +284,64 @@ class Resource(six.with_metaclass(ResourceBase)):
             # String any non-alphanumeric chars from each key
             data = {''.join(x for x in k if x in ALPHANUMERIC).lower(): v for k, v in six.iteritems(data)}
 
+        return data
+
+    def _get_key(self, field):
+        """Returns the key of a field in data normalized by `_normalize_keys`"""
+
+        name = field.name if self._meta.case_sensitive_fields else field.name.lower()
+
+        if self._meta.match_fuzzy_keys:
+            name = ''.join(x for x in name if x in ALPHANUMERIC).lower()
+
+        return name
+
+    def _is_complete(self, data):
+        """Returns True if the data contains every required field (e.g., a nested resource expanded by the server)"""
+
+        data = self._normalize_keys(data)
+        return all(self._get_key(x) in data for x in self._meta.fields if x.required and x.default is None)
+
+    def populate_field_values(self, data):
+        """
+        Load resource data and populate field values. If the resource has already been populated, fields whose raw
+        values haven't changed keep their current values without being converted again. Fields which have been
+        modified locally (and not saved yet) keep their local values.
+
+        :return: The attribute names of fields which were (re)populated
+        """
+
+        previous = None
+        dirty_fields = self._dirty_fields
+        if self._populated_field_values and self._raw_data is not None and self._raw_data is not data:
+            previous = self._normalize_keys(self._raw_data)
+
+        self._raw_data = data
+        data = self._normalize_keys(data)
+        changed = set()
+        profile = profiling.is_active()
+
         for field in self._meta.fields:
-            name = field.name if self._meta.case_sensitive_fields else field.name.lower()
+            name = self._get_key(field)
             value = None
 
-            if self._meta.match_fuzzy_keys:
-                name = ''.join(x for x in name if x in ALPHANUMERIC).lower()
-
-            if name in data:
+            if field._attr_name in dirty_fields and field._attr_name in self.__dict__:
+                continue
+            elif (
+                previous is not None and name in data and name in previous and previous[name] == data[name] and
+                field._attr_name in self.__dict__
+            ):
+                continue
+
+            if name in data and profile:
+                frame = '{0}.{1}'.format(self.__class__.__name__, field._attr_name)
+                profiling.enter(frame)
+                try:
+                    value = field.to_python(data[name], self)
+                finally:
+                    profiling.exit(profiling.FIELD, frame)
+                profiling.tag(value, '{0}.{1}'.format(profiling.get_path(self), field._attr_name))
+            elif name in data:
                 value = field.to_python(data[name], self)
             elif field.required and field.default is None:
                 message = "Response from {0} is missing required field '{1}'".format(self._url, field.name)
@@ -118,33 +352,377 @@ class Resource(six.with_metaclass(ResourceBase)):
             elif field.default is not None:
                 value = copy.copy(field.default)
 
-            setattr(self, field._attr_name, value)
+            # Bypass __setattr__ so that values from the server aren't tracked as changes
+            self.__dict__[field._attr_name] = value
+            changed.add(field._attr_name)
 
+        self.__dict__.pop('_deadline', None)  # Loaded (e.g., by a bulk request), so it's no longer needed
         self._populated_field_values = True
 
+        if changed and self._observers:
+            self._notify(changed)
+
+        return changed
+
+    def refresh(self, nested=False, concurrency=8):
+        """
+        Reloads the resource from the server using a conditional request. If the server reports that the resource
+        hasn't changed, the response isn't parsed, and only fields whose raw values changed are converted again.
+
+        :param nested: If True, nested resources which have already been loaded are refreshed too (concurrently)
+        :return: The attribute names of fields which changed
+        """
+
+        with self._load_lock:
+            changed = self._load_resource(conditional=True)
+
+        if nested:
+            children = []
+            for field in self._meta.fields:
+                values = self.__dict__.get(field._attr_name)
+                for value in values if isinstance(values, list) else [values]:
+                    if isinstance(value, Resource) and value._url and value.__dict__.get('_populated_field_values'):
+                        children.append(value)
+
+            refresh_many(children, nested=True, concurrency=concurrency)
+
+        return changed
+
     def __getattr__(self, item):
-        if self._populated_field_values:
+        # Special attributes (e.g., those probed by pickle or copy) never trigger a load. State is looked up via
+        # __dict__ so that access before __init__ has run (e.g., when unpickling) doesn't recurse.
+        lock = self.__dict__.get('_load_lock')
+        if item.startswith('__') or lock is None or self.__dict__.get('_populated_field_values', True):
             raise AttributeError("'{0}' object has no attribute '{1}'".format(self.__class__.__name__, item))
 
-        self._load_resource()
+        # Other threads accessing the resource while it loads wait for the load to complete rather than repeating it
+        with lock:
+            if not self._populated_field_values:
+                if lazyloads.is_active():
+                    lazyloads.record(self, item)
+                self.load()
+
         return getattr(self, item)
 
+    def load(self):
+        """
+        Loads the resource (with its group's bulk request, if it has one), unless it has already been loaded. Unlike
+        attribute access, this is allowed in strict mode (see `restle.lazyloads`).
+
+        :return: The resource
+        """
+
+        with self._load_lock:
+            if self._populated_field_values:
+                return self
+
+            # A deadline from `get()` (or from the load which created this resource) bounds the first load only
+            with deadlines.deadline(self.__dict__.pop('_deadline', None)):
+                if self._bulk_loader is not None:
+                    self._bulk_loader.load()
+                if not self._populated_field_values:
+                    self._load_resource()
+
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Closes the session, if it was created by this resource. Sessions passed in by the caller are left open."""
+
+        if self._owns_session:
+            self._session.close()
+
+    def _get_changes(self):
+        """Returns changed field values, serialized with `Field.to_value` and keyed by field name"""
+
+        return {
+            x.name: x.to_value(getattr(self, x._attr_name), self)
+            for x in self._meta.fields if x._attr_name in self._dirty_fields
+        }
+
+    def save(self):
+        """
+        Sends fields which have been changed since the resource was loaded to the server. Only changed fields are
+        sent (without loading the resource, if it hasn't been loaded yet), unless `Meta.save_method` is 'PUT', in which
+        case the whole resource is sent.
+
+        :return: True if changes were sent, False if there was nothing to save
+        """
+
+        changes = self._get_changes()
+        if not changes:
+            return False
+
+        if self._meta.json_patch:
+            body = json.dumps([
+                {'op': 'replace', 'path': '/{0}'.format(_escape_pointer(k)), 'value': v}
+                for k, v in six.iteritems(changes)
+            ])
+            content_type = 'application/json-patch+json'
+            method = 'PATCH'
+        else:
+            method = self._meta.save_method
+            if method == 'PUT':
+                changes = {x.name: x.to_value(getattr(self, x._attr_name), self) for x in self._meta.fields}
+            body = self._meta.serializer.to_string(changes)
+            content_type = self._meta.serializer.content_type
+
+        deadline = deadlines.current()
+        r = deadlines.request(
+            self._session, method, self._url, deadline, data=body, headers={'Content-type': content_type},
+            timeout=deadlines.get_timeout(self._url, self._meta.timeout, self._meta.host_timeouts, deadline)
+        )
+        r.close()
+
+        if r.status_code == 404:
+            raise NotFoundException('Server returned 404 Not Found for the URL {0}'.format(self._url))
+        elif not 200 <= r.status_code < 300:
+            raise HTTPException('Server returned {0} ({1})'.format(r.status_code, r.reason), r)
+
+        if self._raw_data is not None:
+            self._raw_data.update(changes)
+        self.__dict__.pop('_dirty_fields', None)
+
+        return True
+
     @classmethod
-    def get(cls, url, strict=True, lazy=True, session=None):
+    def get(cls, url, strict=True, lazy=True, session=None, deadline=None, expand=None):
+        """
+        :param deadline: Seconds (or a `Deadline`) within which the initial load must complete, including the first
+        loads of nested resources it creates (whether they're loaded with it or lazily, later). Each of those loads
+        raises `DeadlineExceeded` once the deadline has passed, and isn't bound by it again if retried. Refreshes
+        aren't bound by it.
+        :param expand: Nested resource fields (by attribute name, e.g., 'author' or 'objects.author') which the server
+        is asked to include in the response, using the `Meta.expand_param` query parameter. Fields the server doesn't
+        expand are loaded separately, as usual.
+        """
+
         self = cls(session=session)
-        o = six.moves.urllib_parse.urlparse(url)
+        base_url, query = urls.split_url(url)
 
         self._params = self._meta.get_parameters.copy()
-        if o.query:
-            query = six.moves.urllib_parse.parse_qs(o.query)
-            self._params.update(
-                {k: v[0] if v else '' for k, v in six.iteritems(query)}
-            )
+        self._params.update(query)
+
+        if expand:
+            self._expand = urls.parse_expand(expand)
+            self._params[self._meta.expand_param] = ','.join(_format_expand(cls, self._expand))
 
-        self._url = '{0}://{1}{2}'.format('https' if self._meta.force_https else o.scheme, o.netloc, o.path)
+        self._url = urls.canonicalize_url(base_url, force_https=self._meta.force_https)
         self._strict = strict
 
+        if deadline is not None:
+            self.__dict__['_deadline'] = deadlines.to_deadline(deadline)
         if not lazy:
-            self._load_resource()
+            self.load()
 
         return self
+
+    def get_request_key(self):
+        """
+        Returns the `RequestKey` (method and canonical URL) of the request which loads this resource. Its `hash`
+        attribute can be used to key caches.
+        """
+
+        return urls.get_request_key(self._url, self._params, self._meta.get_method, self._meta.force_https)
+
+    @classmethod
+    def frozen_class(cls):
+        """Returns the read-only, tuple-backed variant of this resource class (see `FrozenResource`)"""
+
+        if cls._meta.frozen_class is None:
+            attrs = {'__slots__': (), '_resource_class': cls}
+
+            for i, field in enumerate(cls._meta.fields):
+                attrs[field._attr_name] = property(operator.itemgetter(i))
+            attrs['_url'] = property(operator.itemgetter(len(cls._meta.fields)))
+
+            for action in cls._meta.actions:
+                attrs[action._attr_name] = _frozen_action(action)
+
+            cls._meta.frozen_class = type(str('Frozen{0}'.format(cls.__name__)), (FrozenResource,), attrs)
+
+        return cls._meta.frozen_class
+
+    def freeze(self):
+        """Returns a read-only, hashable copy of this resource"""
+
+        return self.frozen_class().from_resource(self)
+
+
+def _escape_pointer(name):
+    """Escapes a field name for use in a JSON Pointer (RFC 6901), e.g., in JSON Patch paths"""
+
+    return name.replace('~', '~0').replace('/', '~1')
+
+
+def _format_expand(resource_class, tree, prefix=''):
+    """Returns the paths to request expansion of, using the fields' `expand_name`"""
+
+    fields_by_attr = {x._attr_name: x for x in resource_class._meta.fields}
+    paths = []
+
+    for name, subtree in sorted(six.iteritems(tree)):
+        field = fields_by_attr.get(name)
+        if not hasattr(field, 'resource_class'):
+            raise ValueError("'{0}' is not a nested resource field of {1}".format(name, resource_class.__name__))
+
+        path = prefix + (field.expand_name or field.name)
+        paths.extend(_format_expand(field.resource_class, subtree, path + '.') if subtree else [path])
+
+    return paths
+
+
+def _freeze_value(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze_value(x) for x in value)
+    elif isinstance(value, set):
+        return frozenset(_freeze_value(x) for x in value)
+    elif isinstance(value, dict):
+        return tuple(sorted((k, _freeze_value(v)) for k, v in six.iteritems(value)))
+    elif isinstance(value, Resource) and value.__dict__.get('_populated_field_values'):
+        return value.freeze()
+
+    return value
+
+
+def _frozen_action(action):
+    def inner(self, *args, **kwargs):
+        return action(self, *args, **kwargs)
+    return inner
+
+
+def _to_pickle_buffer(value, buffers):
+    if type(value) in BINARY_TYPES and len(value) >= PICKLE_BUFFER_SIZE:
+        if id(value) not in buffers:
+            buffers[id(value)] = PickleBuffer(value)
+        return buffers[id(value)]
+
+    return value
+
+
+def _unpickle_frozen(resource_class, values):
+    return tuple.__new__(resource_class.frozen_class(), values)
+
+
+class FrozenResource(tuple):
+    """
+    Read-only variant of a resource class, created with `Resource.frozen_class()`. Field values (and the resource URL)
+    are stored in a tuple, so instances have no `__dict__`, session or bound actions of their own. Instances are
+    immutable and hashable: lists become tuples, dicts become sorted tuples of items, and loaded nested resources are
+    frozen too. Actions are available as methods, and use a shared session.
+    """
+
+    __slots__ = ()
+
+    _resource_class = None
+
+    @property
+    def _session(self):
+        return sessions.get_default_session()
+
+    @classmethod
+    def from_resource(cls, resource):
+        values = [_freeze_value(getattr(resource, x._attr_name)) for x in cls._resource_class._meta.fields]
+        values.append(resource._url)
+        return tuple.__new__(cls, values)
+
+    @classmethod
+    def from_data(cls, items, url=None, strict=True):
+        """Converts a list of deserialized items to a `ResourceCollection` of frozen resources"""
+
+        # A single (mutable) resource is reused to convert each item
+        resource = cls._resource_class(session=sessions.get_default_session())
+        resource._url = url
+        resource._strict = strict
+
+        frozen = []
+        for item in items:
+            resource._populated_field_values = False
+            resource.populate_field_values(item)
+            frozen.append(cls.from_resource(resource))
+
+        return ResourceCollection(frozen)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("'{0}' object is read-only".format(self.__class__.__name__))
+
+    # Frozen resources of different classes (or plain tuples) with the same values aren't equal
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self._resource_class, tuple.__hash__(self)))
+
+    def __reduce__(self):
+        return _unpickle_frozen, (self._resource_class, tuple(self))
+
+    def __repr__(self):
+        return '{0}({1})'.format(self.__class__.__name__, ', '.join(
+            '{0}={1!r}'.format(x._attr_name, v) for x, v in zip(self._resource_class._meta.fields, self)
+        ))
+
+
+def _map_concurrently(fn, resources, concurrency):
+    resources = list(resources)
+    if len(resources) <= 1 or concurrency <= 1:
+        return [fn(x) for x in resources]
+
+    from multiprocessing.pool import ThreadPool
+
+    pool = ThreadPool(min(concurrency, len(resources)))
+    try:
+        return pool.map(fn, resources)
+    finally:
+        pool.close()
+
+
+def save_all(resources, concurrency=8):
+    """
+    Saves many resources, sending up to `concurrency` requests at a time over their (pooled) connections
+
+    :return: A list containing the result of `save()` for each resource
+    """
+
+    return _map_concurrently(lambda x: x.save(), resources, concurrency)
+
+
+def prefetch(resources, concurrency=8):
+    """
+    Loads resources which haven't been loaded yet (e.g., the items of a to-many field), sending up to `concurrency`
+    requests at a time, rather than one at a time as their attributes are accessed. Resources which share a bulk
+    request are loaded with a single request.
+
+    :return: The resources
+    """
+
+    resources = list(resources)
+    pending = [x for x in resources if not x._populated_field_values]
+
+    # One resource per bulk request, then anything the bulk responses didn't include
+    bulk = {}
+    for resource in pending:
+        if resource._bulk_loader is not None:
+            bulk.setdefault(id(resource._bulk_loader), resource)
+
+    _map_concurrently(Resource.load, list(bulk.values()) + [x for x in pending if x._bulk_loader is None], concurrency)
+    _map_concurrently(Resource.load, [x for x in pending if not x._populated_field_values], concurrency)
+
+    return resources
+
+
+def refresh_many(resources, nested=False, concurrency=8):
+    """
+    Refreshes many resources, sending up to `concurrency` conditional requests at a time
+
+    :return: A list containing the result of `refresh()` for each resource
+    """
+
+    return _map_concurrently(lambda x: x.refresh(nested, concurrency), resources, concurrency)
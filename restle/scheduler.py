@@ -0,0 +1,272 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+import six
+
+logger = logging.getLogger(__name__)
+
+# Refresh times are scheduled on a monotonic clock (Python 3.3+), unaffected by system clock adjustments
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class _Entry(object):
+    def __init__(self, resource, ttl, callback):
+        self.resource = resource
+        self.ttl = ttl
+        self.callback = callback
+        self.host = six.moves.urllib_parse.urlparse(resource._url).netloc
+        self.failures = 0
+        self.cancelled = False
+
+
+class RefreshScheduler(object):
+    """
+    Keeps registered resources current by refreshing them (see `Resource.refresh`) once their TTL expires. Due
+    refreshes are coalesced into batches per host. Each host has at most `per_host` batches in flight at a time (due
+    refreshes for a host are split between them when threads are free), and at most `concurrency` batches run at once.
+    Resources which fail to refresh are retried with exponential backoff.
+
+    The scheduler runs either on its own thread (`start()`/`stop()`), or on an asyncio event loop (`attach()`), in
+    which case refreshes run in the loop's executor.
+    """
+
+    def __init__(self, concurrency=8, per_host=4, jitter=0.1, max_backoff=300, nested=False):
+        """
+        :param concurrency: Maximum number of batches being refreshed at once
+        :param per_host: Maximum number of batches being refreshed at once for a single host
+        :param jitter: Fraction by which each refresh interval is randomly lengthened or shortened, to spread load
+        :param max_backoff: Maximum delay (in seconds) before retrying a resource which failed to refresh
+        :param nested: Passed to `Resource.refresh`
+        """
+
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.nested = nested
+
+        self._queue = []
+        self._entries = {}
+        self._busy_hosts = {}  # Number of batches in flight per host
+        self._busy = 0
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._pool = None
+        self._loop = None
+        self._executor = None
+        self._timer = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _push(self, entry, delay):
+        heapq.heappush(self._queue, (_clock() + delay, next(self._counter), entry))
+
+    def register(self, resource, ttl, callback=None):
+        """
+        Registers a resource to be refreshed every `ttl` seconds. The first refresh happens at a random point within
+        the first interval, so that resources registered together aren't refreshed together.
+
+        :param callback: Called with the resource and the set of changed field names whenever fields change
+        """
+
+        with self._condition:
+            self.unregister(resource)
+
+            entry = _Entry(resource, ttl, callback)
+            self._entries[id(resource)] = entry
+            self._push(entry, random.uniform(0, ttl))
+            self._wake()
+
+    def unregister(self, resource):
+        with self._condition:
+            entry = self._entries.pop(id(resource), None)
+            if entry is not None:
+                entry.cancelled = True
+
+    def _wake(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._tick)
+        else:
+            self._condition.notify()
+
+    def _get_interval(self, entry):
+        if entry.failures:
+            interval = min(entry.ttl * 2 ** entry.failures, self.max_backoff)
+        else:
+            interval = entry.ttl
+
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _pop_due(self):
+        """
+        Removes due entries from the queue and groups them into batches per host. Threads which are free once every
+        host has a batch are used to split hosts' entries into more batches. Entries for hosts which already have
+        `per_host` batches in flight stay queued.
+
+        :return: A list of (host, entries) batches
+        """
+
+        now = _clock()
+        due = {}
+        deferred = []
+
+        while self._queue and self._queue[0][0] <= now:
+            item = heapq.heappop(self._queue)
+            entry = item[2]
+
+            if entry.cancelled:
+                continue
+            elif self._busy_hosts.get(entry.host, 0) >= self.per_host or (
+                entry.host not in due and self._busy + len(due) >= self.concurrency
+            ):
+                deferred.append(item)
+            else:
+                due.setdefault(entry.host, []).append(entry)
+
+        for item in deferred:
+            heapq.heappush(self._queue, item)
+
+        # Each host gets one batch, then free threads are shared out between hosts with more than one due entry
+        counts = dict.fromkeys(due, 1)
+        free = self.concurrency - self._busy - len(due)
+        while free > 0:
+            hosts = [
+                x for x in due if counts[x] < len(due[x]) and self._busy_hosts.get(x, 0) + counts[x] < self.per_host
+            ]
+            if not hosts:
+                break
+            for host in hosts[:free]:
+                counts[host] += 1
+            free -= len(hosts[:free])
+
+        batches = []
+        for host, entries in six.iteritems(due):
+            batches.extend((host, entries[i::counts[host]]) for i in range(counts[host]))
+            self._busy_hosts[host] = self._busy_hosts.get(host, 0) + counts[host]
+
+        self._busy += len(batches)
+        return batches
+
+    def _get_delay(self):
+        """Returns the time until the next refresh can be dispatched, or None if there's nothing to wait for"""
+
+        if self._busy >= self.concurrency:
+            return None  # Wait for a batch to complete
+
+        dues = [
+            due for due, _, entry in self._queue
+            if not entry.cancelled and self._busy_hosts.get(entry.host, 0) < self.per_host
+        ]
+        return max(min(dues) - _clock(), 0) if dues else None
+
+    def _refresh_batch(self, host, entries):
+        try:
+            for entry in entries:
+                try:
+                    changed = entry.resource.refresh(nested=self.nested)
+                    entry.failures = 0
+                except Exception:
+                    entry.failures += 1
+                    logger.exception('Error refreshing {0}'.format(entry.resource._url))
+                    continue
+
+                if changed and entry.callback is not None:
+                    try:
+                        entry.callback(entry.resource, changed)
+                    except Exception:
+                        logger.exception('Error in refresh callback for {0}'.format(entry.resource._url))
+        finally:
+            with self._condition:
+                self._busy -= 1
+                self._busy_hosts[host] -= 1
+                if not self._busy_hosts[host]:
+                    del self._busy_hosts[host]
+
+                for entry in entries:
+                    if not entry.cancelled:
+                        self._push(entry, self._get_interval(entry))
+                self._wake()
+
+    def run_pending(self):
+        """Dispatches all due refreshes. Returns the number of batches dispatched."""
+
+        with self._condition:
+            batches = self._pop_due()
+
+        for host, entries in batches:
+            if self._loop is not None:
+                self._loop.run_in_executor(self._executor, self._refresh_batch, host, entries)
+            elif self._pool is not None:
+                self._pool.apply_async(self._refresh_batch, (host, entries))
+            else:
+                self._refresh_batch(host, entries)
+
+        return len(batches)
+
+    def _run(self):
+        while self._running:
+            self.run_pending()
+
+            with self._condition:
+                if self._running:
+                    self._condition.wait(self._get_delay())
+
+    def start(self):
+        """Starts refreshing resources on a background thread"""
+
+        from multiprocessing.pool import ThreadPool
+
+        self._running = True
+        self._pool = ThreadPool(self.concurrency)
+        self._thread = threading.Thread(target=self._run, name='restle-refresh-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, wait=True):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+        if self._thread is not None:
+            if wait:
+                self._thread.join()
+            self._pool.close()
+            if wait:
+                self._pool.join()
+            self._thread = self._pool = None
+
+        if self._loop is not None:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._executor.shutdown(wait=wait)
+            self._loop = self._executor = self._timer = None
+
+    def _tick(self):
+        if self._loop is None:
+            return
+
+        if self._timer is not None:
+            self._timer.cancel()
+
+        self.run_pending()
+
+        with self._condition:
+            delay = self._get_delay()
+
+        self._timer = self._loop.call_later(delay, self._tick) if delay is not None else None
+
+    def attach(self, loop):
+        """Runs the scheduler on an asyncio event loop. Refreshes run in a thread pool executor of the loop."""
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        self._loop = loop
+        self._executor = ThreadPoolExecutor(self.concurrency)
+        loop.call_soon_threadsafe(self._tick)
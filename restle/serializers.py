@@ -9,6 +9,10 @@ class JSONSerializer(object):
     def to_dict(s):
         return json.loads(s, strict=False)
 
+    @staticmethod
+    def from_file(f):
+        return json.loads(f.read().decode('utf-8'), strict=False)  # json.load() only accepts bytes since Python 3.6
+
     @staticmethod
     def to_string(d):
         return json.dumps(d)
@@ -21,6 +25,10 @@ class URLSerializer(object):
     def to_dict(s):
         return six.moves.urllib_parse.parse_qs(s)
 
+    @staticmethod
+    def from_file(f):
+        return six.moves.urllib_parse.parse_qs(f.read().decode('utf-8'))
+
     @staticmethod
     def to_string(d):
-        return six.moves.urllib_parse.urlencode(d)
+        return six.moves.urllib_parse.urlencode(d, doseq=True)
@@ -0,0 +1,65 @@
+import os
+import threading
+import weakref
+
+_sessions = weakref.WeakSet()
+_lock = threading.Lock()
+_default_session = None
+
+
+def track(session):
+    """Registers a session so its connection pools are re-created in forked child processes"""
+
+    from requests import Session
+
+    if isinstance(session, Session):
+        with _lock:
+            _sessions.add(session)
+
+    return session
+
+
+def create_session():
+    # Importing requests is comparatively slow, so it's deferred until the first session is needed
+    from requests import Session
+
+    return track(Session())
+
+
+def get_default_session():
+    """Returns a session shared by resources which aren't bound to a session of their own (e.g., after unpickling)"""
+
+    global _default_session
+
+    if _default_session is None:
+        session = create_session()
+        with _lock:
+            if _default_session is None:
+                _default_session = session
+
+    return _default_session
+
+
+def reset_connection_pools(session):
+    """
+    Replaces the connection pools of a session without closing the existing connections, which may still be in use by
+    the parent process.
+    """
+
+    for adapter in session.adapters.values():
+        if hasattr(adapter, 'init_poolmanager'):
+            adapter.init_poolmanager(adapter._pool_connections, adapter._pool_maxsize, block=adapter._pool_block)
+            adapter.proxy_manager = {}
+
+
+def _after_fork():
+    global _lock
+
+    _lock = threading.Lock()  # The lock may have been held by another thread at the time of the fork
+
+    for session in list(_sessions):
+        reset_connection_pools(session)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,165 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS snapshots (
+    resource_class TEXT NOT NULL,
+    url TEXT NOT NULL,
+    params TEXT NOT NULL,
+    data TEXT NOT NULL,
+    saved_at REAL NOT NULL,
+    validators TEXT NOT NULL,
+    PRIMARY KEY (resource_class, url, params)
+)
+'''
+
+
+def get_class_key(cls):
+    return '{0}.{1}'.format(cls.__module__, getattr(cls, '__qualname__', cls.__name__))
+
+
+class SnapshotStore(object):
+    """
+    Persists hydrated resource state to a local SQLite database so resources can be rehydrated without network I/O.
+    Only the raw (deserialized) field data is stored, along with the resource URL, query parameters and the validators
+    (ETag, Last-Modified) of the response it was loaded from.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path to the SQLite database file. It will be created if it doesn't exist.
+        """
+
+        self.path = path
+        self._local = threading.local()
+
+        with self._connection as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(SCHEMA)
+
+    @property
+    def _connection(self):
+        """SQLite connections can't be shared between threads, so each thread gets its own"""
+
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            self._local.connection = connection
+
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _get_row(self, resource):
+        if resource._raw_data is None:
+            raise ValueError('Cannot snapshot a resource which has not been loaded')
+
+        return (
+            get_class_key(resource.__class__), resource._url, json.dumps(resource._params or {}, sort_keys=True),
+            json.dumps(resource._raw_data), time.time(), json.dumps(resource._validators)
+        )
+
+    def save(self, resource):
+        """Saves (or replaces) the snapshot for a loaded resource"""
+
+        self.save_many([resource])
+
+    def save_many(self, resources):
+        rows = [self._get_row(x) for x in resources]
+
+        with self._connection as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO snapshots (resource_class, url, params, data, saved_at, validators) '
+                'VALUES (?, ?, ?, ?, ?, ?)', rows
+            )
+
+    def load(self, resource_class, url, strict=True, session=None, max_age=None):
+        """
+        Rehydrates a resource from its snapshot without making any requests.
+
+        :param max_age: If given, snapshots older than this many seconds are ignored
+        :return: The populated resource, or None if no (fresh enough) snapshot exists
+        """
+
+        resource = resource_class.get(url, strict=strict, session=session)
+
+        row = self._connection.execute(
+            'SELECT data, saved_at, validators FROM snapshots WHERE resource_class = ? AND url = ? AND params = ?',
+            (get_class_key(resource_class), resource._url, json.dumps(resource._params or {}, sort_keys=True))
+        ).fetchone()
+
+        if row is None or (max_age is not None and time.time() - row[1] > max_age):
+            return None
+
+        resource.populate_field_values(json.loads(row[0]))
+        resource._validators = json.loads(row[2])
+        return resource
+
+    def load_all(self, resource_class, strict=True, session=None):
+        """Rehydrates every stored snapshot of the given resource class"""
+
+        resources = []
+        rows = self._connection.execute(
+            'SELECT url, params, data, validators FROM snapshots WHERE resource_class = ?',
+            (get_class_key(resource_class),)
+        )
+
+        for url, params, data, validators in rows:
+            resource = resource_class(session=session)
+            resource._url = url
+            resource._params = json.loads(params)
+            resource._strict = strict
+            resource.populate_field_values(json.loads(data))
+            resource._validators = json.loads(validators)
+            resources.append(resource)
+
+        return resources
+
+    def delete(self, resource):
+        with self._connection as connection:
+            connection.execute(
+                'DELETE FROM snapshots WHERE resource_class = ? AND url = ? AND params = ?',
+                (get_class_key(resource.__class__), resource._url, json.dumps(resource._params or {}, sort_keys=True))
+            )
+
+    def revalidate(self, resources, callback=None):
+        """
+        Refreshes the given resources (see `Resource.refresh`) in a background thread, updating both the instances (in
+        place) and their snapshots. Requests are conditional, using the validators stored with the snapshots, so
+        unchanged resources aren't transferred again.
+
+        :param callback: Optional function called with each resource after it has been revalidated
+        :return: The (already started) background thread
+        """
+
+        resources = list(resources)
+
+        def run():
+            try:
+                for resource in resources:
+                    try:
+                        resource.refresh()
+                    except Exception:
+                        logger.exception('Error revalidating snapshot for {0}'.format(resource._url))
+                        continue
+
+                    self.save(resource)
+                    if callback is not None:
+                        callback(resource)
+            finally:
+                self.close()
+
+        thread = threading.Thread(target=run, name='restle-snapshot-revalidate')
+        thread.daemon = True
+        thread.start()
+
+        return thread
@@ -0,0 +1,212 @@
+import six
+from requests.exceptions import ReadTimeout
+from urllib3.exceptions import ReadTimeoutError
+
+from restle import deadlines, sessions
+from restle.exceptions import HTTPException, ResourceException
+
+CHUNK_SIZE = 8192
+
+# Used unless the resource class sets a timeout. Streams may be quiet for a while, so the read (idle) timeout is long.
+DEFAULT_TIMEOUT = (10, 300)
+
+NDJSON = 'ndjson'
+SSE = 'sse'
+
+ACCEPT = {
+    NDJSON: 'application/x-ndjson',
+    SSE: 'text/event-stream'
+}
+
+
+def iter_ndjson(lines):
+    """Yields the (non-empty) lines of a newline-delimited JSON stream"""
+
+    for line in lines:
+        if line.strip():
+            yield line
+
+
+def iter_sse(lines, stream=None):
+    """
+    Yields the data of each event in a Server-Sent Events stream. If `stream` is given, its `last_event_id` is updated
+    as events are received.
+    """
+
+    data = []
+
+    for line in lines:
+        if not line:
+            if data:
+                yield b'\n'.join(data)
+                data = []
+            continue
+
+        if line.startswith(b':'):
+            continue  # Comment
+
+        field, _, value = line.partition(b':')
+        if value.startswith(b' '):
+            value = value[1:]
+
+        if field == b'data':
+            data.append(value)
+        elif field == b'id' and stream is not None:
+            stream.last_event_id = value.decode('utf-8')
+
+    if data:
+        yield b'\n'.join(data)
+
+
+class ResourceStream(object):
+    """
+    Consumes a long-lived stream of resource representations (newline-delimited JSON or Server-Sent Events), yielding a
+    populated resource for each event. Events are read from the connection only as they're consumed, so at most one
+    event (of up to `max_event_size` bytes) is buffered at a time.
+
+    If `key` is given, events update the resource with the same value for that field in place (see
+    `Resource.populate_field_values`), rather than creating a new resource.
+
+    Resources only have a URL (needed to refresh or save them, or to load their nested resources) if `relative_path`
+    is given.
+    """
+
+    def __init__(self, resource_class, url, format=NDJSON, key=None, session=None, max_event_size=1024 * 1024,
+                 strict=True, relative_path=None, timeout=None):
+        """
+        :param format: Either 'ndjson' or 'sse'
+        :param key: Name of the field used to identify the resource an event applies to
+        :param max_event_size: Maximum size (in bytes) of a single event
+        :param relative_path: The path of resources, relative to the stream URL, e.g., '../{id}/'. May contain any
+        field of the event.
+        :param timeout: Seconds, or a (connect, read) tuple. The read timeout limits how long the stream may be idle.
+        Defaults to the resource class's `Meta.timeout` (or `Meta.host_timeouts`), or else `DEFAULT_TIMEOUT`.
+        """
+
+        if format not in ACCEPT:
+            raise ValueError("Unsupported stream format: '{0}'".format(format))
+
+        self.resource_class = resource_class
+        self.url = url
+        self.format = format
+        self.key = key
+        self.max_event_size = max_event_size
+        self.strict = strict
+        self.relative_path = relative_path
+        self.timeout = timeout
+        self.resources = {}
+        self.last_event_id = None
+
+        self._session = session if session is not None else sessions.create_session()
+        self._owns_session = session is None
+        self._response = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _iter_chunks(self, response):
+        """Yields data as soon as it's received, rather than waiting for a full chunk to be read"""
+
+        raw = response.raw
+
+        if not getattr(raw, 'chunked', False) and hasattr(raw, 'read1'):
+            while True:
+                try:
+                    chunk = raw.read1(CHUNK_SIZE, decode_content=True)
+                except ReadTimeoutError as e:
+                    raise ReadTimeout(e)  # Raised as a requests exception, like other request errors
+                if not chunk:
+                    break
+                yield chunk
+        else:
+            for chunk in response.iter_content(chunk_size=None):
+                yield chunk
+
+    def _iter_lines(self, response):
+        """Splits the stream into lines, enforcing `max_event_size` so a malformed stream can't exhaust memory"""
+
+        pending = b''
+
+        for chunk in self._iter_chunks(response):
+            pending += chunk
+            lines = pending.splitlines(True)
+            pending = lines.pop() if lines and not lines[-1].endswith(b'\n') else b''
+
+            for line in lines:
+                yield line.rstrip(b'\r\n')
+
+            if len(pending) > self.max_event_size:
+                raise ResourceException('Stream event exceeds the maximum size of {0} bytes'.format(
+                    self.max_event_size
+                ))
+
+        if pending:
+            yield pending
+
+    def _get_resource(self, data):
+        if self.key is not None:
+            resource = self.resources.get(data.get(self.key))
+            if resource is not None:
+                resource.populate_field_values(data)
+                return resource
+
+        if self.relative_path:
+            url = six.moves.urllib_parse.urljoin(self.url, self.relative_path.format(**data))
+            resource = self.resource_class.get(url, strict=self.strict, session=self._session)
+        else:
+            resource = self.resource_class(session=self._session)
+            resource._strict = self.strict
+        resource.populate_field_values(data)
+
+        if self.key is not None:
+            self.resources[data.get(self.key)] = resource
+
+        return resource
+
+    def __iter__(self):
+        headers = {'Accept': ACCEPT[self.format]}
+        if self.last_event_id is not None:
+            headers['Last-Event-ID'] = self.last_event_id
+
+        timeout = self.timeout
+        if timeout is None:
+            meta = self.resource_class._meta
+            timeout = deadlines.get_timeout(self.url, meta.timeout, meta.host_timeouts) or DEFAULT_TIMEOUT
+
+        self._response = self._session.get(self.url, headers=headers, stream=True, timeout=timeout)
+        if not 200 <= self._response.status_code < 300:
+            self.close()
+            raise HTTPException('Server returned {0} ({1})'.format(
+                self._response.status_code, self._response.reason
+            ), self._response)
+
+        deserializer = self.resource_class._meta.deserializer
+        lines = self._iter_lines(self._response)
+        events = iter_sse(lines, self) if self.format == SSE else iter_ndjson(lines)
+
+        try:
+            for event in events:
+                if len(event) > self.max_event_size:
+                    raise ResourceException('Stream event exceeds the maximum size of {0} bytes'.format(
+                        self.max_event_size
+                    ))
+
+                yield self._get_resource(deserializer.to_dict(event.decode('utf-8')))
+        finally:
+            self._response.close()
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+
+        if self._owns_session:
+            self._session.close()
+
+
+def stream(resource_class, url, **kwargs):
+    """Shortcut for iterating over a `ResourceStream`"""
+
+    return iter(ResourceStream(resource_class, url, **kwargs))
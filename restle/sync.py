@@ -0,0 +1,186 @@
+from collections import namedtuple
+
+import six
+
+from restle import deadlines, loading, sessions
+
+SyncResult = namedtuple('SyncResult', ('created', 'updated', 'deleted'))
+
+
+class CollectionSync(object):
+    """
+    Mirrors a (large) collection of resources locally, transferring only what changed since the previous sync. Items
+    which already exist locally are updated in place (see `Resource.populate_field_values`), so only fields whose values
+    changed are converted again.
+
+    The collection is paged with `next` links, and each page lists items as `objects`, and deleted items (by key) as
+    `deleted`. Changes are requested using a high-water mark from the previous sync:
+
+    - With `cursor_param`, the change cursor returned by the server (as `cursor`) is sent back in that parameter
+    - With `since_param`, the latest `updated` value of any item seen is sent in that parameter
+    - Otherwise, pages are requested conditionally using their ETags. Unchanged pages aren't transferred, and items
+      which no longer appear on any page are deleted.
+
+    The first sync (or any sync in ETag mode) lists the whole collection, so local items which weren't listed are
+    deleted.
+    """
+
+    def __init__(self, resource_class, url, key='id', cursor_param=None, since_param=None, relative_path=None,
+                 resources=None, state=None, strict=True, session=None, objects_key='objects', deleted_key='deleted',
+                 next_key='next', cursor_key='cursor', since_key='updated'):
+        """
+        :param key: Name of the field (in the response data) which identifies items
+        :param cursor_param: Query parameter used to send the change cursor
+        :param since_param: Query parameter used to send the latest `since_key` value seen
+        :param relative_path: The relative path (from the collection URL) of items, e.g., '{id}/'. May contain any
+        field of the item.
+        :param resources: Existing local resources (e.g., loaded from a `SnapshotStore`) to update
+        :param state: The `state` of a previous sync of these resources
+        """
+
+        if cursor_param and since_param:
+            raise ValueError('Only one of cursor_param and since_param may be given')
+
+        self.resource_class = resource_class
+        self.url = url
+        self.key = key
+        self.cursor_param = cursor_param
+        self.since_param = since_param
+        self.relative_path = relative_path
+        self.strict = strict
+        self.objects_key = objects_key
+        self.deleted_key = deleted_key
+        self.next_key = next_key
+        self.cursor_key = cursor_key
+        self.since_key = since_key
+
+        self.resources = {(x._raw_data or {}).get(key): x for x in resources or []}
+        self.mark = (state or {}).get('mark')
+        self.pages = (state or {}).get('pages', {})
+
+        self._session = session if session is not None else sessions.create_session()
+        self._owns_session = session is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def state(self):
+        """The high-water mark of the last sync, as a JSON-serializable dict"""
+
+        return {'mark': self.mark, 'pages': self.pages}
+
+    @property
+    def _param(self):
+        return self.cursor_param or self.since_param
+
+    def _fetch(self, url, params, etag=None):
+        """Returns the deserialized page and its ETag, or (None, etag) if the page hasn't changed"""
+
+        # Pages aren't cached, since the cache can't tell whether a page changed since the last sync
+        validators = {'If-None-Match': etag} if etag else None
+        data, r = loading.fetch(self._session, self.resource_class, url, params, validators=validators, use_cache=False)
+
+        if data is None:
+            return None, etag
+        return data, r.headers.get('ETag')
+
+    def _create(self, item):
+        url = self.url
+        if self.relative_path:
+            url = six.moves.urllib_parse.urljoin(self.url, self.relative_path.format(**item))
+
+        resource = self.resource_class.get(url, strict=self.strict, session=self._session)
+        resource.populate_field_values(item)
+        return resource
+
+    def sync(self, deadline=None):
+        """
+        Requests changes since the last sync and applies them to `resources`. If a request fails, the high-water mark
+        isn't advanced, so the next sync requests the same changes again. Page requests use the resource class's
+        `Meta.timeout`, `Meta.host_timeouts` and `Meta.hedge`.
+
+        :param deadline: Seconds (or a `Deadline`) within which all pages must be fetched
+        :return: A `SyncResult` of the resources which were created, updated and deleted
+        """
+
+        with deadlines.deadline(deadline):
+            return self._sync()
+
+    def _sync(self):
+        created, updated, deleted = [], [], []
+        changed = set()
+        full = self.mark is None or not self._param
+        mark = self.mark
+        pages = {}
+        keys = set()
+
+        url = self.url
+        params = {self._param: self.mark} if self._param and self.mark is not None else {}
+
+        while url:
+            page = None if self._param else self.pages.get(url)
+            data, etag = self._fetch(url, params, page and page['etag'])
+
+            if data is None:
+                keys.update(page['keys'])
+                pages[url] = page
+                url, params = page['next'], {}
+                continue
+
+            if isinstance(data, list):
+                objects, data = data, {}
+            else:
+                objects = data.get(self.objects_key) or []
+
+            page_keys = []
+            for item in objects:
+                key = item.get(self.key)
+                page_keys.append(key)
+                resource = self.resources.get(key)
+
+                # Items may be listed twice if they change while the collection is being paged through
+                if resource is None:
+                    self.resources[key] = resource = self._create(item)
+                    created.append(resource)
+                    changed.add(id(resource))
+                elif resource.populate_field_values(item) and id(resource) not in changed:
+                    updated.append(resource)
+                    changed.add(id(resource))
+
+                value = item.get(self.since_key)
+                if self.since_param and value is not None and (mark is None or value > mark):
+                    mark = value
+
+            for key in data.get(self.deleted_key) or []:
+                resource = self.resources.pop(key, None)
+                if resource is not None:
+                    deleted.append(resource)
+
+            if self.cursor_param and data.get(self.cursor_key) is not None:
+                mark = data[self.cursor_key]
+
+            next_url = data.get(self.next_key)
+            next_url = six.moves.urllib_parse.urljoin(url, next_url) if next_url else None
+
+            if not self._param and etag:
+                pages[url] = {'etag': etag, 'keys': page_keys, 'next': next_url}
+
+            keys.update(page_keys)
+            url, params = next_url, {}  # Next links include the query
+
+        if full:
+            for key in [x for x in self.resources if x not in keys]:
+                deleted.append(self.resources.pop(key))
+
+        self.mark = mark
+        self.pages = pages
+
+        return SyncResult(created, updated, deleted)
+
+    def close(self):
+        if self._owns_session:
+            self._session.close()
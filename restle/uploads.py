@@ -0,0 +1,91 @@
+import json
+
+import six
+
+CHUNK_SIZE = 64 * 1024
+
+
+def is_stream(body):
+    """Returns True if a request body is streamed (a file, buffer or iterable) rather than a string"""
+
+    return body is not None and not isinstance(body, (six.text_type, six.binary_type))
+
+
+def iter_chunks(body, chunk_size=CHUNK_SIZE):
+    """
+    Yields a request body in chunks of bytes. File objects are read a chunk at a time, and buffers (e.g., memoryviews
+    and mmaps) are sliced without being copied. Other iterables are assumed to yield bytes already.
+    """
+
+    if isinstance(body, six.text_type):
+        yield body.encode('utf-8')
+    elif isinstance(body, six.binary_type):
+        yield body
+    elif hasattr(body, 'read'):
+        while True:
+            chunk = body.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk.encode('utf-8') if isinstance(chunk, six.text_type) else chunk
+    else:
+        try:
+            view = memoryview(body)
+        except TypeError:
+            for chunk in body:
+                yield chunk
+        else:
+            for i in range(0, view.nbytes, chunk_size):
+                yield view[i:i + chunk_size]
+
+
+def _to_key(key):
+    """Converts a dictionary key to a string the way `json.dumps` does, e.g., True to 'true' and None to 'null'"""
+
+    if isinstance(key, six.string_types):
+        return key
+    elif key is None or isinstance(key, six.integer_types + (float,)):
+        return json.dumps(key)
+
+    raise TypeError('keys must be str, int, float, bool or None, not {0}'.format(key.__class__.__name__))
+
+
+def _iter_json(value):
+    if isinstance(value, dict):
+        yield '{'
+        for i, (k, v) in enumerate(six.iteritems(value)):
+            yield '{0}{1}: '.format(', ' if i else '', json.dumps(_to_key(k)))
+            for part in _iter_json(v):
+                yield part
+        yield '}'
+    elif hasattr(value, '__iter__') and not isinstance(value, (six.text_type, six.binary_type)):
+        yield '['
+        for i, item in enumerate(value):
+            if i:
+                yield ', '
+            for part in _iter_json(item):
+                yield part
+        yield ']'
+    else:
+        yield json.dumps(value)
+
+
+def iter_json(value, chunk_size=CHUNK_SIZE):
+    """
+    Encodes a value as JSON incrementally, yielding chunks of about `chunk_size` bytes. Lists and other iterables
+    (e.g., generators) are encoded an item at a time, so large or lazily generated lists are never held in memory.
+    """
+
+    parts = []
+    size = 0
+
+    for part in _iter_json(value):
+        parts.append(part)
+        size += len(part)
+
+        if size >= chunk_size:
+            yield ''.join(parts).encode('utf-8')
+            parts = []
+            size = 0
+
+    if parts:
+        yield ''.join(parts).encode('utf-8')
@@ -0,0 +1,135 @@
+import hashlib
+from collections import namedtuple
+
+import six
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class RequestKey(namedtuple('RequestKey', ('method', 'url'))):
+    """
+    Identifies a request by its method and canonical URL (see `canonicalize_url`). Requests for the same logical
+    resource have equal keys, however their URLs were written.
+    """
+
+    __slots__ = ()
+
+    @property
+    def hash(self):
+        """A hash of the key which is stable across processes (unlike `hash()`), for use by caches"""
+
+        return hashlib.sha1(' '.join(self).encode('utf-8')).hexdigest()
+
+
+def _to_text(value):
+    if isinstance(value, six.binary_type):
+        return value.decode('utf-8')
+    return six.text_type(value)
+
+
+def normalize_params(params):
+    """
+    Returns query parameters as a list of (name, value) pairs, sorted by name. Parameters may be given as a dict (with
+    a list for parameters having several values) or as a list of pairs. The order of values of the same parameter is
+    preserved. A value of None stands for a parameter without a value (e.g., `?flag`), which isn't the same as an empty
+    value (`?flag=`) to every server.
+    """
+
+    items = six.iteritems(params) if isinstance(params, dict) else params or []
+    pairs = []
+
+    for key, value in items:
+        for item in value if isinstance(value, (list, tuple)) else [value]:
+            pairs.append((_to_text(key), None if item is None else _to_text(item)))
+
+    return sorted(pairs, key=lambda x: x[0])
+
+
+def parse_query(query):
+    """Parses a query string into a list of (name, value) pairs. Parameters without a value have a value of None."""
+
+    unquote = six.moves.urllib_parse.unquote_plus
+    pairs = []
+
+    for part in query.split('&'):
+        if not part:
+            continue
+
+        key, sep, value = part.partition('=')
+        pairs.append((unquote(key), unquote(value) if sep else None))
+
+    return pairs
+
+
+def _encode_query(pairs):
+    quote = six.moves.urllib_parse.quote_plus
+    return '&'.join(
+        quote(k.encode('utf-8')) if v is None else '{0}={1}'.format(quote(k.encode('utf-8')), quote(v.encode('utf-8')))
+        for k, v in pairs
+    )
+
+
+def split_url(url):
+    """Splits a URL into its base (without query or fragment) and a dict of its query parameters"""
+
+    o = six.moves.urllib_parse.urlsplit(url)
+    params = {}
+
+    for key, value in parse_query(o.query):
+        params.setdefault(key, []).append(value)
+
+    base = six.moves.urllib_parse.urlunsplit((o.scheme, o.netloc, o.path, '', ''))
+    return base, {k: v[0] if len(v) == 1 else v for k, v in six.iteritems(params)}
+
+
+def canonicalize_url(url, params=None, force_https=False):
+    """
+    Returns the canonical form of a URL: the scheme and host are lower-cased, default ports and fragments are removed,
+    and the query parameters (from the URL and `params`) are sorted by name and encoded consistently. Parameters without
+    a value are kept bare.
+
+    :param params: Additional query parameters (see `normalize_params`)
+    :param force_https: If True, the scheme is changed to 'https'
+    """
+
+    o = six.moves.urllib_parse.urlsplit(url)
+    scheme = 'https' if force_https else o.scheme.lower()
+
+    netloc = (o.hostname or '').lower()
+    if ':' in netloc:
+        netloc = '[{0}]'.format(netloc)  # IPv6
+    if o.port is not None and o.port != DEFAULT_PORTS.get(scheme):
+        netloc = '{0}:{1}'.format(netloc, o.port)
+    if o.username is not None:
+        userinfo = o.username if o.password is None else '{0}:{1}'.format(o.username, o.password)
+        netloc = '{0}@{1}'.format(userinfo, netloc)
+
+    query = _encode_query(normalize_params(parse_query(o.query) + normalize_params(params)))
+
+    return six.moves.urllib_parse.urlunsplit((scheme, netloc, o.path or '/', query, ''))
+
+
+def get_request_key(url, params=None, method='GET', force_https=False):
+    return RequestKey(method.upper(), canonicalize_url(url, params, force_https))
+
+
+def parse_expand(paths):
+    """Converts a list of dotted paths (e.g., ['objects.author', 'objects.tags']) to a tree of attribute names"""
+
+    tree = {}
+    for path in paths:
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+
+    return tree
+
+
+def get_expand_paths(tree, prefix=''):
+    """The reverse of `parse_expand`"""
+
+    paths = []
+    for name, subtree in sorted(six.iteritems(tree)):
+        paths.extend(get_expand_paths(subtree, prefix + name + '.') if subtree else [prefix + name])
+
+    return paths
@@ -28,5 +28,6 @@ setup(
     url='https://github.com/consbio/restle',
     license='BSD',
     tests_require=['pytest', 'pytest-cov', 'httpretty==0.8.6', 'mock'],
+    entry_points={'console_scripts': ['restle-load = restle.loadgen:main']},
     cmdclass={'test': PyTest}
 )
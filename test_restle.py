@@ -1,16 +1,104 @@
+import gc
+import gzip
+import io
 import json
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
 
 import httpretty
-from mock import Mock
+from mock import Mock, patch
 import pytest
 import six
-from requests import Session
+from requests import Response, Session
+from requests.exceptions import RequestException
 
 from restle import fields
 from restle.actions import Action
-from restle.exceptions import HTTPException, MissingFieldException, NotFoundException
-from restle.resources import Resource
+from restle import (
+    cache, compression, deadlines, lazyloads, loading, loadgen, parallel, profiling, replay, sessions, uploads, urls
+)
+from restle.collection import ResourceCollection
+from restle.scheduler import RefreshScheduler, _clock as scheduler_clock
+from restle.streaming import ResourceStream
+from restle.sync import CollectionSync
+from restle.compression import compress
+from restle.exceptions import (
+    DeadlineExceeded, HTTPException, ImplicitLoadException, ImplicitLoadWarning, MissingFieldException,
+    NotFoundException, ReplayException, ResourceException
+)
+from restle.resources import Resource, prefetch, refresh_many, save_all
 from restle.serializers import JSONSerializer, URLSerializer
+from restle.snapshots import SnapshotStore
+
+
+def make_response(status_code=200, reason='Ok', body=b''):
+    response = Response()
+    response.status_code = status_code
+    response.reason = reason
+    response.raw = io.BytesIO(body)
+    return response
+
+
+@pytest.fixture
+def stub_server(request):
+    """
+    Starts a local HTTP server which responds to GET requests with the bodies in `stub_server.responses`, and records
+    the path, headers and (de-chunked) body of POST requests in `stub_server.requests`
+    """
+
+    class Handler(six.moves.BaseHTTPServer.BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.headers.get('Transfer-Encoding') == 'chunked':
+                body = b''
+                while True:
+                    size = int(self.rfile.readline().strip(), 16)
+                    body += self.rfile.read(size)
+                    self.rfile.readline()
+                    if not size:
+                        break
+            else:
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            server.requests.append((self.path, self.headers, body))
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def do_GET(self):
+            chunks = server.responses[self.path]
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.end_headers()
+
+            for chunk in chunks:
+                if isinstance(chunk, float):
+                    time.sleep(chunk)  # Stall
+                    continue
+                self.wfile.write(chunk)
+                self.wfile.flush()
+
+        def log_message(self, *args):
+            pass
+
+    server = six.moves.BaseHTTPServer.HTTPServer(('127.0.0.1', 0), Handler)
+    server.responses = {}
+    server.requests = []
+    server.url = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+    thread.daemon = True
+    thread.start()
+
+    def fin():
+        server.shutdown()
+        server.server_close()
+
+    request.addfinalizer(fin)
+    return server
 
 
 @pytest.fixture
@@ -115,35 +203,162 @@ class TestActions(object):
 
     def test_process_response(self, basic_action):
         # Bad status
-        response = Mock(status_code=500, reason='Server error')
+        response = make_response(status_code=500, reason='Server error')
         with pytest.raises(HTTPException):
             basic_action.process_response(response)
 
         # No response
-        response = Mock(status_code=200, reason='Ok')
+        response = make_response()
         assert basic_action.process_response(response) is None
 
         # Dict response
+        body = b'{"one": 1, "two": 2}'
         basic_action.response_type = basic_action.DICT_RESPONSE
         basic_action.deserializer = JSONSerializer()
-        response = Mock(status_code=200, reason='Ok', text='{"one": 1, "two": 2}')
-        data = basic_action.process_response(response)
+        data = basic_action.process_response(make_response(body=body))
         assert data['one'] == 1
         assert data['two'] == 2
 
         # Aliases
         basic_action.response_aliases = {'one': 'neo', 'two': 'tow'}
-        data = basic_action.process_response(response)
+        data = basic_action.process_response(make_response(body=body))
         assert data['neo'] == 1
         assert data['tow'] == 2
 
         # Object response
         basic_action.response_type = basic_action.OBJECT_RESPONSE
-        obj = basic_action.process_response(response)
+        obj = basic_action.process_response(make_response(body=body))
         assert obj.neo == 1
         assert obj.tow == 2
 
 
+    def test_raw_response(self, httpretty_activate):
+        uri = 'http://example.com/my-resource/raw'
+        body = compress(b'{"foo": "bar"}' * 1000, 'gzip')
+        httpretty.register_uri(
+            httpretty.POST, uri, body=body, adding_headers={'Content-Encoding': 'gzip', 'Content-Type': 'text/plain'}
+        )
+
+        action = Action('action', response_type=Action.RAW_RESPONSE)
+        response = action.process_response(action.do_request(uri, '', ''))
+        assert response.content == body
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.status_code == 200
+
+        action.response_type = Action.STREAM_RESPONSE
+        response = action.process_response(action.do_request(uri, '', ''))
+        assert b''.join(response) == body
+
+        httpretty.register_uri(httpretty.POST, uri, status=500)
+        with pytest.raises(HTTPException):
+            action.process_response(action.do_request(uri, '', ''))
+
+    def test_streaming_upload(self, stub_server):
+        class UploadResource(Resource):
+            upload = Action('upload/', optional_params=['name', 'data'], body_param='data', request_encoding='gzip')
+            upload_raw = Action('upload/', optional_params=['data'], body_param='data')
+            bulk_create = Action('bulk/', required_params=['items'], params_via_post=True, stream_body=True,
+                                 serializer=JSONSerializer)
+
+        r = UploadResource.get('{0}/files/'.format(stub_server.url))
+        r.upload(name='data.bin', data=(b'x' * 1000 for _ in range(100)))
+
+        path, headers, body = stub_server.requests[-1]
+        assert path == '/files/upload/?name=data.bin'
+        assert headers['Transfer-Encoding'] == 'chunked'
+        assert headers['Content-Encoding'] == 'gzip'
+        assert gzip.GzipFile(fileobj=io.BytesIO(body)).read() == b'x' * 100000
+
+        r.upload_raw(data=memoryview(b'abc' * 1000))
+        path, headers, body = stub_server.requests[-1]
+        assert headers['Content-Length'] == '3000'
+        assert body == b'abc' * 1000
+
+        items = [{'id': i, 'tags': ['a', 'b']} for i in range(5000)]
+        r.bulk_create(items=(x for x in items))
+        path, headers, body = stub_server.requests[-1]
+        assert headers['Transfer-Encoding'] == 'chunked'
+        assert json.loads(body.decode('utf-8')) == {'items': items}
+
+    def test_iter_json(self):
+        value = {'a': [1, 2.5, None, True], 'b': {'c': 'd\u00e9'}, 'e': (x for x in range(3)), 'f': []}
+        encoded = b''.join(uploads.iter_json(value, chunk_size=4))
+        assert json.loads(encoded.decode('utf-8')) == {
+            'a': [1, 2.5, None, True], 'b': {'c': 'd\u00e9'}, 'e': [0, 1, 2], 'f': []
+        }
+
+        # Keys are converted as json.dumps() converts them
+        value = {True: 1, False: 2, None: 3, 4: 4, 1.5: 5}
+        assert b''.join(uploads.iter_json(value)).decode('utf-8') == json.dumps(value)
+        with pytest.raises(TypeError):
+            list(uploads.iter_json({(1, 2): 'x'}))
+
+        assert list(uploads.iter_chunks(memoryview(b'abcde'), 2)) == [b'ab', b'cd', b'e']
+        assert list(uploads.iter_chunks(io.BytesIO(b'abcde'), 2)) == [b'ab', b'cd', b'e']
+
+
+class TestCompression(object):
+    def test_compress(self):
+        data = b'{"foo": "bar"}' * 100
+        assert gzip.GzipFile(fileobj=io.BytesIO(compress(data, 'gzip'))).read() == data
+
+        with pytest.raises(ValueError):
+            compress(data, 'unknown')
+
+    def test_available_encodings(self):
+        with patch.dict(compression._modules, {'brotli': object(), 'zstandard': None}):
+            with patch('urllib3.util.request.ACCEPT_ENCODING', 'gzip,deflate'):
+                assert compression.get_available_encodings() == ['gzip', 'deflate']
+            with patch('urllib3.util.request.ACCEPT_ENCODING', 'gzip,deflate,br'):
+                assert compression.get_available_encodings() == ['br', 'gzip', 'deflate']
+
+    def test_compressed_response(self, httpretty_activate):
+        uri = 'http://example.com/my-resource'
+        body = json.dumps({'name': 'Foo' * 1000, 'description': 'Bar'}).encode()
+        httpretty.register_uri(
+            httpretty.GET, uri, body=compress(body, 'gzip'), adding_headers={'Content-Encoding': 'gzip'}
+        )
+
+        r = TestResource.BasicResource.get(uri, lazy=False)
+        assert r.name == 'Foo' * 1000
+        assert 'gzip' in httpretty.last_request().headers['Accept-Encoding']
+
+        stats = r.compression_stats
+        assert stats.encoding == 'gzip'
+        assert stats.content_bytes == len(body)
+        assert stats.wire_bytes < stats.content_bytes
+        assert stats.ratio > 1
+
+        # Responses to actions are recorded too
+        action_body = json.dumps({'status': 'ok' * 1000}).encode()
+        httpretty.register_uri(
+            httpretty.GET, uri + '/status', body=compress(action_body, 'gzip'),
+            adding_headers={'Content-Encoding': 'gzip'}
+        )
+        action = Action('status', http_method='GET', response_type=Action.DICT_RESPONSE, deserializer=JSONSerializer())
+        assert action(r) == {'status': 'ok' * 1000}
+        assert r.compression_stats is not stats
+        assert r.compression_stats.content_bytes == len(action_body)
+
+    def test_compressed_request(self, basic_action, httpretty_activate):
+        uri = 'http://example.com/my-resource/action'
+        httpretty.register_uri(httpretty.POST, uri)
+
+        body = 'foo=' + 'bar' * 1000
+        basic_action.params_via_post = True
+        basic_action.request_encoding = 'gzip'
+        basic_action.do_request(uri, body, 'application/x-www-form-urlencoded')
+
+        request = httpretty.last_request()
+        assert request.headers['Content-Encoding'] == 'gzip'
+        assert gzip.GzipFile(fileobj=io.BytesIO(request.body)).read().decode() == body
+
+        # Small bodies are sent uncompressed
+        basic_action.do_request(uri, 'foo=bar', 'application/x-www-form-urlencoded')
+        assert 'Content-Encoding' not in httpretty.last_request().headers
+        assert httpretty.last_request().body.decode() == 'foo=bar'
+
+
 class TestResource(object):
     class BasicResource(Resource):
         name = fields.TextField()
@@ -261,6 +476,264 @@ class TestResource(object):
 
         assert httpretty.last_request().headers['cookie'] == 'Foo=Bar'
 
+    def test_concurrent_lazy_load(self):
+        r = self.BasicResource.get('http://example.com/my-resource')
+
+        def load():
+            time.sleep(0.05)
+            r.populate_field_values({'name': 'Foo', 'description': 'Bar'})
+
+        r._load_resource = Mock(side_effect=load)
+
+        names = []
+        threads = [threading.Thread(target=lambda: names.append(r.name)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert names == ['Foo'] * 8
+        assert r._load_resource.call_count == 1
+
+    def test_close(self):
+        with self.BasicResource.get('http://example.com/my-resource') as r:
+            r._session.close = Mock()
+        assert r._session.close.called
+
+        session = Mock()
+        r = self.BasicResource.get('http://example.com/my-resource', session=session)
+        r.close()
+        assert not session.close.called
+
+    def test_reset_connection_pools(self):
+        session = sessions.create_session()
+        poolmanager = session.adapters['http://'].poolmanager
+
+        sessions._after_fork()
+        assert session.adapters['http://'].poolmanager is not poolmanager
+        assert session.adapters['http://']._pool_maxsize == poolmanager.connection_pool_kw['maxsize']
+
+    def test_save(self, httpretty_activate):
+        uri = 'http://example.com/my-resource'
+        httpretty.register_uri(httpretty.PATCH, uri)
+        httpretty.register_uri(httpretty.PUT, uri)
+
+        class SaveResource(Resource):
+            name = fields.TextField()
+            count = fields.IntegerField()
+
+            class Meta:
+                serializer = JSONSerializer()
+
+        r = SaveResource.get(uri)
+        r.populate_field_values({'name': 'Foo', 'count': 1})
+        assert r.save() is False
+
+        r.other = 'x'
+        assert not r._dirty_fields and '_dirty_fields' not in r.__dict__
+
+        r.count = 2.0
+        assert r._dirty_fields == {'count'}
+        assert r.save() is True
+        assert httpretty.last_request().method == 'PATCH'
+        assert json.loads(httpretty.last_request().body.decode()) == {'count': 2}
+        assert not r._dirty_fields
+        assert r._raw_data == {'name': 'Foo', 'count': 2}
+
+        r._meta.json_patch = True
+        r.name = 'Bar'
+        r.save()
+        assert httpretty.last_request().headers['Content-Type'] == 'application/json-patch+json'
+        assert json.loads(httpretty.last_request().body.decode()) == [
+            {'op': 'replace', 'path': '/name', 'value': 'Bar'}
+        ]
+
+        r._meta.json_patch = False
+        r._meta.save_method = 'PUT'
+        r.name = 'Baz'
+        r.save()
+        assert httpretty.last_request().method == 'PUT'
+        assert json.loads(httpretty.last_request().body.decode()) == {'name': 'Baz', 'count': 2}
+
+    def test_save_lazy(self, httpretty_activate):
+        uri = 'http://example.com/my-resource/lazy-save'
+        httpretty.register_uri(httpretty.GET, uri, body='{"name": "Foo", "a/b~c": 1}')
+        httpretty.register_uri(httpretty.PATCH, uri)
+
+        class LazySaveResource(Resource):
+            name = fields.TextField()
+            path = fields.IntegerField(name='a/b~c')
+
+            class Meta:
+                serializer = JSONSerializer()
+                json_patch = True
+                timeout = 7
+
+        # Changes to a resource which hasn't been loaded are saved without loading it
+        r = LazySaveResource.get(uri)
+        r.name = 'Bar'
+        r.path = 2
+        start = len(httpretty.HTTPretty.latest_requests)
+        with patch.object(r._session, 'patch', wraps=r._session.patch) as send:
+            assert r.save() is True
+            assert send.call_args[1]['timeout'] == 7
+        assert len(httpretty.HTTPretty.latest_requests) - start == 1
+        assert sorted(json.loads(httpretty.last_request().body.decode()), key=lambda x: x['path']) == [
+            {'op': 'replace', 'path': '/a~1b~0c', 'value': 2}, {'op': 'replace', 'path': '/name', 'value': 'Bar'}
+        ]
+
+        # Unsaved changes are kept when the resource is loaded
+        r = LazySaveResource.get(uri)
+        r.name = 'Baz'
+        assert r.path == 1
+        assert r.name == 'Baz'
+        assert r._dirty_fields == {'name'}
+
+    def test_save_nested_ids(self, httpretty_activate):
+        uri = 'http://example.com/nested-save/'
+        httpretty.register_uri(httpretty.PUT, uri)
+
+        class ChildResource(Resource):
+            id = fields.IntegerField()
+
+        class ParentResource(Resource):
+            children = fields.ToManyField(ChildResource, 'id', relative_path='{id}/')
+            partner = fields.ToOneField(ChildResource, 'partial', relative_path='{id}/')
+
+            class Meta:
+                serializer = JSONSerializer()
+                save_method = 'PUT'
+
+        r = ParentResource.get(uri)
+        r.populate_field_values({'children': [7, 8, 9], 'partner': {'id': 3}})
+        r.children[0].populate_field_values({'id': 10})
+        r.partner = r.partner
+
+        # Unloaded nested resources are serialized by the ids they were created with, without loading them
+        start = len(httpretty.HTTPretty.latest_requests)
+        with lazyloads.strict():
+            assert r.save() is True
+        assert len(httpretty.HTTPretty.latest_requests) - start == 1
+        assert json.loads(httpretty.last_request().body.decode()) == {'children': [10, 8, 9], 'partner': {'id': 3}}
+
+        # The id is kept when pickled
+        copy = ChildResource.__new__(ChildResource)
+        copy.__setstate__(r.children[1].__getstate__())
+        assert ParentResource._meta.fields[0]._get_id(copy) == 8
+
+    def test_save_all(self, httpretty_activate):
+        resources = []
+        for i in range(4):
+            uri = 'http://example.com/my-resource/{0}'.format(i)
+            httpretty.register_uri(httpretty.PATCH, uri, status=200 if i < 3 else 500)
+
+            r = self.BasicResource.get(uri)
+            r.populate_field_values({'name': 'Foo', 'description': 'Bar'})
+            resources.append(r)
+
+        resources[0].name = 'Changed'
+        assert save_all(resources[:3]) == [True, False, False]
+
+        resources[3].name = 'Changed'
+        with pytest.raises(HTTPException):
+            save_all(resources)
+
+    def test_refresh(self, httpretty_activate):
+        uri = 'http://example.com/my-resource'
+        httpretty.register_uri(httpretty.GET, uri, responses=[
+            httpretty.Response(body='{"name": "Foo", "info": {"a": 1}}', adding_headers={'ETag': '"v1"'}),
+            httpretty.Response(body='', status=304),
+            httpretty.Response(body='{"name": "Bar", "info": {"a": 1}}', adding_headers={'ETag': '"v2"'})
+        ])
+
+        class RefreshResource(Resource):
+            name = fields.TextField()
+            info = fields.ObjectField()
+
+        r = RefreshResource.get(uri, lazy=False)
+        info = r.info
+        assert r.name == 'Foo'
+
+        assert r.refresh() == set()
+        assert httpretty.last_request().headers['If-None-Match'] == '"v1"'
+
+        assert refresh_many([r]) == [{'name'}]
+        assert r.name == 'Bar'
+        assert r.info is info
+        assert r._validators == {'If-None-Match': '"v2"'}
+
+    def test_refresh_nested(self):
+        class ParentResource(Resource):
+            child = fields.ToOneField(self.BasicResource, 'id', relative_path='{id}/')
+
+        r = ParentResource.get('http://example.com/parent/')
+        r.populate_field_values({'child': 1})
+        r._load_resource = Mock(return_value=set())
+
+        with patch.object(self.BasicResource, 'refresh') as refresh:
+            r.refresh(nested=True)
+            assert not refresh.called  # Nested resource hasn't been loaded
+
+            r.child.populate_field_values({'name': 'Foo', 'description': 'Bar'})
+            r.refresh(nested=True)
+            assert refresh.called
+
+    def test_nested_session(self):
+        class ParentResource(Resource):
+            child = fields.ToOneField(self.BasicResource, 'full', relative_path='{id}/')
+            partner = fields.ToOneField(self.BasicResource, 'id', relative_path='{id}/')
+
+        # Nested resources use the parent's session (e.g., for its authentication) when they're refreshed or saved
+        session = sessions.create_session()
+        r = ParentResource.get('http://example.com/parent/', session=session)
+        r.populate_field_values({'child': {'id': 1, 'name': 'Foo', 'description': 'Bar'}, 'partner': 2})
+        assert r.child._session is session
+        assert r.partner._session is session
+
+    def test_frozen(self, httpretty_activate):
+        httpretty.register_uri(httpretty.POST, 'http://example.com/my-resource/action', body='{"status": "ok"}')
+
+        class FrozenTestResource(Resource):
+            name = fields.TextField()
+            tags = fields.ListField()
+            info = fields.DictField()
+            action = Action('action', response_type=Action.DICT_RESPONSE, deserializer=JSONSerializer())
+
+        items = [{'name': 'Foo', 'tags': ['a', 'b'], 'info': {'x': 1}}, {'name': 'Bar', 'tags': [], 'info': {}}]
+        frozen = FrozenTestResource.frozen_class().from_data(items, url='http://example.com/my-resource')
+
+        assert FrozenTestResource.frozen_class() is type(frozen[0])
+        assert frozen[0].name == 'Foo'
+        assert frozen[0].tags == ('a', 'b')
+        assert frozen[0].info == (('x', 1),)
+        assert frozen[1].name == 'Bar'
+        assert frozen[0]._url == 'http://example.com/my-resource'
+        same = FrozenTestResource.frozen_class().from_data(items[:1], url='http://example.com/my-resource')[0]
+        assert len({frozen[0], frozen[1], same}) == 2
+        assert frozen[0].action() == {'status': 'ok'}
+
+        with pytest.raises(AttributeError):
+            frozen[0].name = 'Baz'
+        with pytest.raises(AttributeError):
+            frozen[0].other = 'Baz'
+
+        r = FrozenTestResource()
+        r.populate_field_values(items[0])
+        assert tuple(r.freeze()) == frozen[0][:3] + (None,)
+
+        # Only frozen resources of the same class are equal
+        class OtherFrozenTestResource(FrozenTestResource):
+            pass
+
+        other = OtherFrozenTestResource.frozen_class().from_data(items[:1], url='http://example.com/my-resource')[0]
+        assert tuple(other) == tuple(frozen[0])
+        assert other != frozen[0] and frozen[0] != tuple(frozen[0])
+        assert len({frozen[0], other}) == 2
+        assert sys.getsizeof(frozen[0]) < sys.getsizeof(r) + sys.getsizeof(r.__dict__)
+
+        frozen = self.BasicResource.frozen_class().from_data([{'name': 'Foo', 'description': 'Bar'}])[0]
+        assert pickle.loads(pickle.dumps(frozen)) == frozen
+
     def test_field_inheritance(self):
         """ Makes sure fields from a parent class are properly inherited by the subclasses """
 
@@ -293,6 +766,976 @@ class TestResource(object):
         assert r.description == 'Bar'
         assert r.tags == ['foo', 'bar']
 
+    def test_lazy_preparation(self):
+        class LazyResource(Resource):
+            name = fields.TextField()
+
+        assert '_pending' in LazyResource.__dict__
+        assert [x.name for x in LazyResource._meta.fields] == ['name']
+        assert '_pending' not in LazyResource.__dict__
+
+        with pytest.raises(TypeError):
+            class InvalidMetaResource(Resource):
+                class Meta:
+                    not_an_option = True
+
+    def test_import_time(self):
+        """ Importing restle and defining resources shouldn't import the HTTP stack or prepare classes """
+
+        script = '\n'.join((
+            'import sys, time',
+            'start = time.time()',
+            'from restle import fields',
+            'from restle.resources import Resource',
+            'classes = [',
+            '    type(Resource)("R{0}".format(i), (Resource,), {"name": fields.TextField(), "__module__": "test"})',
+            '    for i in range(500)',
+            ']',
+            'elapsed = time.time() - start',
+            'assert "requests" not in sys.modules, "requests imported"',
+            'assert all("_pending" in x.__dict__ for x in classes)',
+            'assert elapsed < 2, elapsed',
+        ))
+
+        assert subprocess.call([sys.executable, '-c', script]) == 0
+
+
+class TestSnapshots(object):
+    def test_save_and_load(self, tmpdir):
+        store = SnapshotStore(str(tmpdir.join('snapshots.db')))
+
+        r = TestResource.BasicResource.get('http://example.com/my-resource?foo=bar')
+        r.populate_field_values({'name': 'Foo', 'description': 'Bar'})
+        store.save(r)
+
+        # No requests are made (httpretty isn't active)
+        loaded = store.load(TestResource.BasicResource, 'http://example.com/my-resource?foo=bar')
+        assert loaded.name == 'Foo'
+        assert loaded.description == 'Bar'
+        assert loaded._params == {'foo': 'bar'}
+
+        assert store.load(TestResource.BasicResource, 'http://example.com/my-resource') is None
+        assert store.load(TestResource.BasicResource, 'http://example.com/my-resource?foo=bar', max_age=-1) is None
+        assert [x.name for x in store.load_all(TestResource.BasicResource)] == ['Foo']
+
+        store.delete(r)
+        assert store.load_all(TestResource.BasicResource) == []
+
+        with pytest.raises(ValueError):
+            store.save(TestResource.BasicResource.get('http://example.com/my-resource'))
+
+    def test_revalidate(self, tmpdir, httpretty_activate):
+        uri = 'http://example.com/my-resource'
+        httpretty.register_uri(httpretty.GET, uri, body='{"name": "New", "description": "Bar"}')
+
+        store = SnapshotStore(str(tmpdir.join('snapshots.db')))
+        r = TestResource.BasicResource.get(uri)
+        r.populate_field_values({'name': 'Old', 'description': 'Bar'})
+        store.save(r)
+
+        callback = Mock()
+        store.revalidate([r], callback=callback).join()
+
+        assert r.name == 'New'
+        callback.assert_called_with(r)
+        assert store.load(TestResource.BasicResource, uri).name == 'New'
+
+    def test_revalidate_conditional(self, tmpdir, httpretty_activate):
+        uri = 'http://example.com/my-resource/conditional'
+
+        def body(request, uri, headers):
+            if request.headers.get('If-None-Match') == '"v1"':
+                return 304, headers, ''
+            headers['ETag'] = '"v1"'
+            return 200, headers, '{"name": "Foo", "description": "Bar"}'
+
+        httpretty.register_uri(httpretty.GET, uri, body=body)
+
+        path = str(tmpdir.join('snapshots.db'))
+        store = SnapshotStore(path)
+        store.save(TestResource.BasicResource.get(uri, lazy=False))
+        store.close()
+
+        # The stored validators are sent, so the unchanged resource isn't transferred again
+        r = SnapshotStore(path).load_all(TestResource.BasicResource)[0]
+        assert r._validators == {'If-None-Match': '"v1"'}
+        callback = Mock()
+        store.revalidate([r], callback=callback).join()
+        assert httpretty.last_request().headers['If-None-Match'] == '"v1"'
+        assert r.name == 'Foo'
+        callback.assert_called_with(r)
+
+
+class TestReplay(object):
+    def test_record_and_replay(self, tmpdir):
+        path = str(tmpdir.join('cassette.json'))
+        uri = 'http://example.com/my-resource'
+        missing_uri = 'http://example.com/not-there'
+
+        httpretty.enable()
+        try:
+            httpretty.register_uri(
+                httpretty.GET, uri, body=compress(b'{"name": "Foo", "description": "Bar"}', 'gzip'),
+                adding_headers={'Content-Encoding': 'gzip'}
+            )
+            httpretty.register_uri(httpretty.GET, missing_uri, status=404)
+            httpretty.register_uri(httpretty.POST, uri + '/action', body='{"status": "ok"}')
+
+            session = Session()
+            replay.record(session, path)
+            r = TestResource.BasicResource.get(uri, lazy=False, session=session)
+            assert r.name == 'Foo'
+            with pytest.raises(NotFoundException):
+                TestResource.BasicResource.get(missing_uri, lazy=False, session=session)
+
+            action = Action('action', response_type=Action.DICT_RESPONSE, deserializer=JSONSerializer())
+            assert action(r) == {'status': 'ok'}
+            session.close()
+        finally:
+            httpretty.disable()
+
+        session = Session()
+        cassette = replay.replay(session, path)
+        assert len(cassette.interactions) == 3
+
+        r = TestResource.BasicResource.get(uri, lazy=False, session=session)
+        assert r.name == 'Foo'
+        assert r.description == 'Bar'
+        with pytest.raises(NotFoundException):
+            TestResource.BasicResource.get(missing_uri, lazy=False, session=session)
+        assert action(r) == {'status': 'ok'}
+
+        with pytest.raises(ReplayException):
+            TestResource.BasicResource.get('http://example.com/other', lazy=False, session=session)
+
+    def test_simulated_latency(self):
+        cassette = replay.Cassette()
+        cassette.record(
+            Mock(method='GET', url='http://example.com/my-resource', body=None),
+            Mock(status_code=200, reason='Ok', headers={}, elapsed=Mock(total_seconds=Mock(return_value=0))),
+            b'{"name": "Foo", "description": "Bar"}'
+        )
+
+        session = Session()
+        latency = Mock(return_value=0.01)
+        session.mount('http://', replay.ReplayAdapter(cassette, latency=latency, bandwidth=1000000))
+
+        r = TestResource.BasicResource.get('http://example.com/my-resource', lazy=False, session=session)
+        assert r.name == 'Foo'
+        assert latency.called
+
+
+class TestParallel(object):
+    class ItemResource(Resource):
+        id = fields.IntegerField()
+        info = fields.ObjectField()
+        children = fields.ToManyField(TestResource.BasicResource, 'full', relative_path='{id}/', id_field='name')
+
+    class BinaryResource(Resource):
+        name = fields.TextField()
+        data = fields.Field()
+        extra = fields.TextField(required=False)
+        mark_read = Action('mark-read/')
+
+    def get_items(self, count):
+        return [{
+            'id': i,
+            'info': {'foo': [{'bar': i}]},
+            'children': [{'name': 'child', 'description': str(i)}]
+        } for i in range(count)]
+
+    def test_hydrate(self):
+        session = Session()
+        items = parallel.hydrate(
+            self.ItemResource, self.get_items(5), url='http://example.com/items/', processes=2, chunk_size=2,
+            session=session
+        )
+
+        assert [x.id for x in items] == list(range(5))
+        assert items[3].info.foo[0].bar == 3
+        assert items[3].children[0].description == '3'
+        assert items[3].children[0]._url == 'http://example.com/items/child/'
+        assert items[3].children[0]._session is session
+
+    def test_hydrate_records(self):
+        records = parallel.hydrate(
+            self.ItemResource, self.get_items(3), url='http://example.com/items/', processes=2, chunk_size=2,
+            records=True
+        )
+        assert [x['id'] for x in records] == [0, 1, 2]
+        assert records[1]['info'].foo[0].bar == 1
+
+    def test_hydrate_inline(self):
+        items = parallel.hydrate(self.ItemResource, self.get_items(3), url='http://example.com/items/')
+        assert [x.id for x in items] == [0, 1, 2]
+
+    def test_pickle(self):
+        r = TestResource.BasicResource(name='Foo', description='Bar')
+        copy = pickle.loads(pickle.dumps(r))
+        assert copy.name == 'Foo'
+        assert copy._session is sessions.get_default_session()
+
+        # Pickling a lazy resource doesn't load it
+        r = TestResource.BasicResource.get('http://example.com/my-resource')
+        with patch.object(TestResource.BasicResource, '_load_resource') as load:
+            copy = pickle.loads(pickle.dumps(r))
+            assert not load.called
+        assert copy._url == 'http://example.com/my-resource'
+
+    @pytest.mark.skipif(sys.version_info < (3, 8), reason='Pickle protocol 5 requires Python 3.8')
+    def test_pickle_state(self):
+        BinaryResource = self.BinaryResource
+
+        r = BinaryResource.get('http://example.com/binary/?a=1')
+        r.populate_field_values({'name': 'Foo', 'data': b'x' * 100000})
+        r._validators = {'If-None-Match': '"v1"'}
+        r.name = 'Bar'
+        del r.__dict__['extra']
+
+        # Only field values and the state needed to refresh and save the resource are pickled
+        state = r.__getstate__()
+        assert state[:5] == ('http://example.com/binary/', {'a': '1'}, True, ('Bar', b'x' * 100000, None), ('extra',))
+
+        buffers = []
+        data = pickle.dumps(r, protocol=5, buffer_callback=buffers.append)
+        assert len(data) < 1000
+
+        copy = pickle.loads(data, buffers=buffers)
+        assert (copy.name, bytes(copy.data)) == ('Bar', b'x' * 100000)
+        assert copy._raw_data['data'] is copy.data
+        assert 'extra' not in copy.__dict__
+        assert copy._dirty_fields == {'name'}
+        assert copy._validators == {'If-None-Match': '"v1"'}
+        assert copy._raw_data['name'] == 'Foo'
+        assert copy._session is sessions.get_default_session()
+        assert copy.mark_read.__name__ == 'inner'
+
+
+class TestScheduler(object):
+    def get_resources(self, hosts):
+        resources = []
+        for host in hosts:
+            r = TestResource.BasicResource.get('http://{0}/my-resource'.format(host))
+            r.refresh = Mock(return_value={'name'})
+            resources.append(r)
+
+        return resources
+
+    def test_run_pending(self):
+        scheduler = RefreshScheduler(concurrency=1, per_host=1)
+        resources = self.get_resources(['one.example.com', 'one.example.com', 'two.example.com'])
+        callback = Mock()
+
+        for r in resources:
+            scheduler.register(r, ttl=0, callback=callback)
+        assert len(scheduler) == 3
+
+        # Only one host is refreshed at a time
+        assert scheduler.run_pending() == 1
+        assert scheduler.run_pending() == 1
+        assert all(x.refresh.call_count == 1 for x in resources)
+        callback.assert_called_with(resources[2], {'name'})
+
+        scheduler.unregister(resources[0])
+        scheduler.run_pending()
+        scheduler.run_pending()
+        assert resources[0].refresh.call_count == 1
+        assert resources[1].refresh.call_count == 2
+
+    def test_per_host(self):
+        scheduler = RefreshScheduler(concurrency=4, per_host=3)
+        resources = self.get_resources(['one.example.com'] * 5 + ['two.example.com'])
+        for r in resources:
+            scheduler.register(r, ttl=0)
+
+        # Both hosts get a batch, and the remaining threads are used to split up the first host's refreshes
+        with scheduler._condition:
+            batches = scheduler._pop_due()
+        assert sorted((host, len(entries)) for host, entries in batches) == [
+            ('one.example.com', 1), ('one.example.com', 2), ('one.example.com', 2), ('two.example.com', 1)
+        ]
+        assert scheduler._busy_hosts == {'one.example.com': 3, 'two.example.com': 1}
+
+        for host, entries in batches:
+            scheduler._refresh_batch(host, entries)
+        assert all(x.refresh.call_count == 1 for x in resources)
+        assert scheduler._busy == 0 and not scheduler._busy_hosts
+
+    def test_backoff(self):
+        scheduler = RefreshScheduler(jitter=0, max_backoff=10)
+        r = self.get_resources(['example.com'])[0]
+        r.refresh.side_effect = ValueError
+
+        scheduler.register(r, ttl=0.001)
+        time.sleep(0.01)
+        scheduler.run_pending()
+        assert scheduler._entries[id(r)].failures == 1
+        assert scheduler._queue[0][0] - scheduler_clock() > 0.001
+
+    def test_thread(self):
+        scheduler = RefreshScheduler()
+        resources = self.get_resources(['one.example.com', 'two.example.com'])
+        for r in resources:
+            scheduler.register(r, ttl=0.01)
+
+        scheduler.start()
+        time.sleep(0.1)
+        scheduler.stop()
+
+        assert all(x.refresh.call_count > 1 for x in resources)
+
+    @pytest.mark.skipif(six.PY2, reason='asyncio requires Python 3')
+    def test_asyncio(self):
+        import asyncio
+
+        scheduler = RefreshScheduler()
+        r = self.get_resources(['example.com'])[0]
+
+        loop = asyncio.new_event_loop()
+        try:
+            scheduler.attach(loop)
+            scheduler.register(r, ttl=0.01)
+            loop.run_until_complete(asyncio.sleep(0.1))
+            scheduler.stop()
+        finally:
+            loop.close()
+
+        assert r.refresh.call_count > 1
+
+
+class TestStreaming(object):
+    def test_ndjson(self, stub_server):
+        stub_server.responses['/items'] = [
+            b'{"name": "Foo", "description": "one"}\n{"name": "Bar", ',
+            b'"description": "two"}\n\n{"name": "Foo", "description": "three"}\n'
+        ]
+
+        with ResourceStream(TestResource.BasicResource, stub_server.url + '/items', key='name') as stream:
+            resources = []
+            descriptions = []
+            for resource in stream:
+                resources.append(resource)
+                descriptions.append(resource.description)
+
+        assert descriptions == ['one', 'two', 'three']
+        assert resources[0] is resources[2]
+        assert set(stream.resources) == {'Foo', 'Bar'}
+        assert resources[0]._url is None
+
+    def test_item_urls_and_timeout(self, stub_server):
+        stub_server.responses['/api/items/stream/'] = [b'{"name": "foo", "description": "one"}\n', 0.5]
+
+        stream = ResourceStream(
+            TestResource.BasicResource, stub_server.url + '/api/items/stream/', relative_path='../{name}/',
+            timeout=(1, 0.1)
+        )
+        resources = []
+        with pytest.raises(RequestException):
+            for resource in stream:
+                resources.append(resource)  # The stalled stream times out after this
+        stream.close()
+
+        assert resources[0]._url == stub_server.url + '/api/items/foo/'
+        assert resources[0].description == 'one'
+
+    def test_sse(self, stub_server):
+        stub_server.responses['/events'] = [
+            b': comment\n\nid: 1\ndata: {"name": "Foo",\ndata: "description": "one"}\n\n',
+            b'id: 2\ndata: {"name": "Bar", "description": "two"}\n\n'
+        ]
+
+        stream = ResourceStream(TestResource.BasicResource, stub_server.url + '/events', format='sse')
+        resources = list(stream)
+        stream.close()
+
+        assert [x.name for x in resources] == ['Foo', 'Bar']
+        assert stream.last_event_id == '2'
+
+    def test_max_event_size(self, stub_server):
+        stub_server.responses['/items'] = [b'{"name": "' + b'x' * 100 + b'"}\n']
+
+        stream = ResourceStream(TestResource.BasicResource, stub_server.url + '/items', max_event_size=50)
+        with pytest.raises(ResourceException):
+            list(stream)
+
+
+class TestCollection(object):
+    class ItemResource(Resource):
+        id = fields.IntegerField()
+        color = fields.TextField()
+        size = fields.IntegerField(required=False)
+
+    def get_collection(self):
+        items = []
+        for i, (color, size) in enumerate((('red', 3), ('blue', 1), ('red', 2), ('green', None))):
+            r = self.ItemResource()
+            r.populate_field_values({'id': i, 'color': color, 'size': size})
+            items.append(r)
+
+        return ResourceCollection(items)
+
+    def test_filter(self):
+        c = self.get_collection()
+
+        assert [x.id for x in c.filter(color='red')] == [0, 2]
+        assert [x.id for x in c.filter(color__in=['blue', 'green'])] == [1, 3]
+        assert [x.id for x in c.filter(size__gt=1)] == [2, 0]
+        assert [x.id for x in c.filter(size__gte=2, color='red')] == [2, 0]
+        assert [x.id for x in c.filter(size__lt=2)] == [1]
+        assert [x.id for x in c.filter(size__lte=2)] == [1, 2]
+        assert isinstance(c.filter(color='red'), ResourceCollection)
+
+        with pytest.raises(ValueError):
+            c.filter(size__foo=1)
+
+    def test_get_by_and_group_by(self):
+        c = self.get_collection()
+
+        assert c.get_by(2) is c[2]
+        assert c.get_by(10) is None
+        assert c.get_by('green', field='color') is c[3]
+        assert {k: len(v) for k, v in c.group_by('color').items()} == {'red': 2, 'blue': 1, 'green': 1}
+
+    def test_index_updates(self):
+        c = self.get_collection()
+        assert len(c.filter(color='red')) == 2
+        assert len(c.filter(size__gte=2)) == 2
+
+        c[1].populate_field_values({'id': 1, 'color': 'red', 'size': 5})
+        assert set(x.id for x in c.filter(color='red')) == {0, 1, 2}
+        assert [x.id for x in c.filter(size__gte=2)] == [2, 0, 1]
+
+        c[0].color = 'blue'
+        assert set(x.id for x in c.filter(color='red')) == {1, 2}
+
+        c.append(self.get_collection()[0])
+        assert len(c.filter(color='red')) == 3
+
+        c.clear()
+        assert c.filter(color='red') == []
+        c.extend(self.get_collection()[:1])
+        assert len(c.filter(color='red')) == 1
+        c *= 2
+        assert len(c.filter(color='red')) == 2
+
+    def test_unhashable_values(self):
+        class TaggedResource(Resource):
+            id = fields.IntegerField()
+            tags = fields.ListField()
+
+        c = ResourceCollection()
+        for i, tags in enumerate((['a'], ['b', 'c'], ['a'])):
+            r = TaggedResource()
+            r.populate_field_values({'id': i, 'tags': tags})
+            c.append(r)
+
+        # Unhashable values can't be indexed, so they're compared one by one
+        assert [x.id for x in c.filter(tags=['a'])] == [0, 2]
+        assert [x.id for x in c.filter(tags__in=[['b', 'c'], ['d']])] == [1]
+        assert c.get_by(['b', 'c'], field='tags') is c[1]
+        assert c.filter(id=['a']) == []
+
+        with pytest.raises(ValueError) as e:
+            c.group_by('tags')
+        assert "'tags'" in str(e.value)
+
+    def test_observers_removed(self):
+        c = self.get_collection()
+        for _ in range(100):
+            assert c.filter(color='red').get_by(2) is c[2]
+        gc.collect()
+        assert len(c[2]._observers) == 1
+
+        c[2].color = 'blue'
+        assert c.filter(color='red') == [c[0]]
+
+    def test_nested(self):
+        r = TestParallel.ItemResource()
+        r._url = 'http://example.com/items/'
+        r.populate_field_values({'id': 1, 'info': {}, 'children': [{'name': 'Foo', 'description': 'Bar'}]})
+        assert r.children.get_by('Foo', field='name').description == 'Bar'
+
+
+class TestSync(object):
+    class ItemResource(Resource):
+        id = fields.IntegerField()
+        name = fields.TextField()
+
+    def test_cursor(self, httpretty_activate):
+        changes = {
+            None: {'objects': [{'id': 1, 'name': 'Foo'}, {'id': 2, 'name': 'Bar'}], 'cursor': 'c1'},
+            'c1': {'objects': [{'id': 1, 'name': 'Baz'}, {'id': 3, 'name': 'Qux'}], 'deleted': [2], 'cursor': 'c2'},
+            'c2': {'objects': [], 'cursor': 'c2'}
+        }
+
+        def body(request, uri, headers):
+            cursor = request.querystring.get('cursor', [None])[0]
+            return 200, headers, json.dumps(changes[cursor])
+
+        httpretty.register_uri(httpretty.GET, 'http://example.com/sync-cursor/', body=body)
+
+        sync = CollectionSync(self.ItemResource, 'http://example.com/sync-cursor/', cursor_param='cursor')
+        result = sync.sync()
+        assert [x.id for x in result.created] == [1, 2]
+        assert sync.state['mark'] == 'c1'
+
+        foo = sync.resources[1]
+        result = sync.sync()
+        assert [x.id for x in result.created] == [3]
+        assert result.updated == [foo] and foo.name == 'Baz'
+        assert [x.id for x in result.deleted] == [2]
+        assert sorted(sync.resources) == [1, 3]
+
+        # Resume from saved state and resources
+        sync = CollectionSync(
+            self.ItemResource, 'http://example.com/sync-cursor/', cursor_param='cursor', state=sync.state,
+            resources=list(sync.resources.values())
+        )
+        assert sync.sync() == ([], [], [])
+        assert httpretty.last_request().querystring == {'cursor': ['c2']}
+        assert sorted(sync.resources) == [1, 3]
+
+    def test_timeouts(self, httpretty_activate):
+        class TimeoutItemResource(Resource):
+            id = fields.IntegerField()
+
+            class Meta:
+                timeout = 5
+                host_timeouts = {'slow.example.com': 20}
+
+        httpretty.register_uri(httpretty.GET, 'http://slow.example.com/sync/', body=json.dumps({'objects': []}))
+        session = sessions.create_session()
+
+        with patch.object(session, 'get', wraps=session.get) as get:
+            sync = CollectionSync(TimeoutItemResource, 'HTTP://Slow.example.com/sync/', session=session)
+            sync.sync()
+            assert get.call_args[0][0] == 'http://slow.example.com/sync/'
+            assert get.call_args[1]['timeout'] == 20
+
+            sync.sync(deadline=10)
+            assert 0 < get.call_args[1]['timeout'] <= 10
+
+        with pytest.raises(DeadlineExceeded):
+            sync.sync(deadline=0)
+
+    def test_since(self, httpretty_activate):
+        items = {1: {'id': 1, 'name': 'Foo', 'updated': 10}, 2: {'id': 2, 'name': 'Bar', 'updated': 20}}
+
+        def body(request, uri, headers):
+            since = int(request.querystring.get('since', [0])[0])
+            return 200, headers, json.dumps({'objects': [x for x in items.values() if x['updated'] >= since]})
+
+        httpretty.register_uri(httpretty.GET, 'http://example.com/sync-since/', body=body)
+
+        sync = CollectionSync(self.ItemResource, 'http://example.com/sync-since/', since_param='since')
+        assert len(sync.sync().created) == 2
+        assert sync.mark == 20
+
+        items[1] = {'id': 1, 'name': 'Baz', 'updated': 30}
+        result = sync.sync()
+        assert httpretty.last_request().querystring == {'since': ['20']}
+        assert [x.id for x in result.updated] == [1]  # Item 2 is listed again, but hasn't changed
+        assert sync.mark == 30
+
+    def test_etags(self, httpretty_activate):
+        pages = {
+            '1': {'objects': [{'id': 1, 'name': 'Foo'}], 'next': '?page=2'},
+            '2': {'objects': [{'id': 2, 'name': 'Bar'}, {'id': 3, 'name': 'Baz'}]}
+        }
+        requests = []
+
+        def body(request, uri, headers):
+            page = request.querystring.get('page', ['1'])[0]
+            etag = '"{0}"'.format(hash(json.dumps(pages[page], sort_keys=True)))
+            requests.append(page)
+            headers['ETag'] = etag
+
+            if request.headers.get('If-None-Match') == etag:
+                return 304, headers, ''
+            return 200, headers, json.dumps(pages[page])
+
+        httpretty.register_uri(httpretty.GET, 'http://example.com/sync-etags/', body=body)
+
+        sync = CollectionSync(self.ItemResource, 'http://example.com/sync-etags/', relative_path='{id}/')
+        assert len(sync.sync().created) == 3
+        assert sync.resources[2]._url == 'http://example.com/sync-etags/2/'
+
+        # Only the second page changed, so only its items are applied, and missing items are deleted
+        pages['2'] = {'objects': [{'id': 2, 'name': 'Qux'}]}
+        del requests[:]
+        result = sync.sync()
+        assert requests == ['1', '2']
+        assert [x.name for x in result.updated] == ['Qux']
+        assert [x.id for x in result.deleted] == [3]
+        assert sorted(sync.resources) == [1, 2]
+
+
+class TestProfiling(object):
+    def test_profiler(self, httpretty_activate):
+        message = {'id': 2389, 'sender': 'Pi Pyson', 'message': 'Hello!', 'read': False}
+        httpretty.register_uri(httpretty.GET, 'http://example.com/api/messages/2389/', body=json.dumps(message))
+        httpretty.register_uri(httpretty.GET, 'http://example.com/api/messages/', body=json.dumps({'objects': [2389]}))
+
+        class MessageClient(Resource):
+            id = fields.IntegerField()
+            sender = fields.TextField()
+            message = fields.TextField()
+            read = fields.BooleanField()
+
+        class MessageListClient(Resource):
+            objects = fields.ToManyField(MessageClient, 'id', relative_path='{id}/')
+
+        with profiling.Profiler() as profiler:
+            c = MessageListClient.get('http://example.com/api/messages/', lazy=False)
+            assert c.objects[0].message == 'Hello!'
+
+        MessageListClient.get('http://example.com/api/messages/', lazy=False)
+
+        assert profiler.fetches['MessageListClient'][0] == 1
+        assert profiler.fetches['MessageListClient.objects'][0] == 1
+        assert profiler.fields['MessageListClient.objects'][0] == 1
+        assert profiler.fields['MessageClient.message'][0] == 1
+        assert profiler.bytes['MessageClient'] == [1, len(json.dumps(message))]
+        assert 'MessageClient.message' in profiler.report()
+
+        f = six.StringIO()
+        profiler.dump_collapsed(f)
+        stacks = [x.rsplit(' ', 1)[0] for x in f.getvalue().splitlines()]
+        assert 'GET MessageListClient' in stacks
+        assert 'MessageListClient.objects' in stacks
+        assert 'GET MessageListClient.objects' in stacks
+        assert 'MessageClient.message' in stacks
+
+
+class LazyItemClient(Resource):
+    id = fields.IntegerField()
+    name = fields.TextField()
+
+
+class LazyItemListClient(Resource):
+    objects = fields.ToManyField(LazyItemClient, 'id', relative_path='{id}/')
+
+
+class TestLazyLoads(object):
+    @pytest.fixture
+    def items(self, httpretty_activate):
+        httpretty.register_uri(httpretty.GET, 'http://example.com/lazy/', body=json.dumps({'objects': [1, 2, 3]}))
+        for i in (1, 2, 3):
+            httpretty.register_uri(
+                httpretty.GET, 'http://example.com/lazy/{0}/'.format(i), body=json.dumps({'id': i, 'name': str(i)})
+            )
+
+        return LazyItemListClient.get('http://example.com/lazy/', lazy=False).objects
+
+    def test_detector(self, items):
+        with lazyloads.Detector(threshold=2) as detector:
+            with pytest.warns(ImplicitLoadWarning) as record:
+                names = [x.name for x in items]
+
+        assert names == ['1', '2', '3']
+        assert len(record) == 1 and record[0].filename == __file__
+        assert list(detector.sites.values()) == [3]
+        assert detector.classes == {'LazyItemClient': 3}
+        assert 'LazyItemClient' in detector.report()
+
+        items[0].name  # Already loaded
+        with lazyloads.Detector(threshold=0, action=lazyloads.RAISE):
+            items[0].name
+            with pytest.raises(ImplicitLoadException):
+                LazyItemClient.get('http://example.com/lazy/1/').name
+
+    def test_strict(self, items):
+        with lazyloads.strict():
+            with pytest.raises(ImplicitLoadException):
+                items[0].name
+
+            start = len(httpretty.HTTPretty.latest_requests)
+            assert prefetch(items, concurrency=2) == items
+            assert len(httpretty.HTTPretty.latest_requests) - start == 3
+            assert [x.name for x in items] == ['1', '2', '3']
+            assert items[0].load() is items[0]
+
+        lazyloads.set_strict(True)
+        try:
+            with pytest.raises(ImplicitLoadException):
+                LazyItemClient.get('http://example.com/lazy/1/').name
+        finally:
+            lazyloads.set_strict(False)
+
+        assert LazyItemClient.get('http://example.com/lazy/1/').name == '1'
+
+
+class TestUrls(object):
+    def test_canonicalize_url(self):
+        url = urls.canonicalize_url('HTTP://Example.com:80/api/?b=2&a=1&b=1#top')
+        assert url == 'http://example.com/api/?a=1&b=2&b=1'
+        assert urls.canonicalize_url('http://example.com/api/?a=1', {'b': ['2', '1']}) == url
+        assert urls.canonicalize_url('http://example.com:8080', force_https=True) == 'https://example.com:8080/'
+        assert urls.canonicalize_url('http://example.com/?q=a b') == 'http://example.com/?q=a+b'
+
+        # Parameters without a value are kept bare, since some servers treat them differently from empty values
+        assert urls.canonicalize_url('http://example.com/?flag&b=1&e=') == 'http://example.com/?b=1&e=&flag'
+        assert urls.canonicalize_url('http://example.com/', {'flag': None}) == 'http://example.com/?flag'
+        assert urls.split_url('http://example.com/?flag&b=1') == ('http://example.com/', {'flag': None, 'b': '1'})
+
+    def test_request_key(self):
+        key = urls.get_request_key('http://example.com/api/?b=2&a=1')
+        assert key == urls.get_request_key('http://EXAMPLE.com/api/?a=1', {'b': 2}, method='get')
+        assert key.hash == urls.get_request_key('http://example.com/api/?a=1&b=2').hash
+        assert key.hash != urls.get_request_key('http://example.com/api/?a=1&b=2', method='POST').hash
+
+    def test_resource_request(self, httpretty_activate):
+        httpretty.register_uri(
+            httpretty.GET, 'http://example.com/my-resource', body='{"name": "Foo", "description": ""}'
+        )
+
+        class ParamsResource(TestResource.BasicResource):
+            class Meta:
+                get_parameters = {'format': 'json'}
+
+        r = ParamsResource.get('HTTP://Example.com/my-resource?tag=b&tag=a')
+        assert r.get_request_key() == ('GET', 'http://example.com/my-resource?format=json&tag=b&tag=a')
+        assert r.name == 'Foo'
+        assert httpretty.last_request().querystring == {'format': ['json'], 'tag': ['b', 'a']}
+
+
+class TestLoading(object):
+    class KeyedResource(Resource):
+        name = fields.TextField()
+
+        class Meta:
+            get_parameters = {'key': 'secret'}
+
+    def test_fetch(self, httpretty_activate):
+        uri = 'http://example.com/loading/'
+
+        def body(request, uri, headers):
+            if request.headers.get('If-None-Match') == '"v1"':
+                return 304, headers, ''
+            headers['ETag'] = '"v1"'
+            return 200, headers, json.dumps({'name': 'Foo'})
+
+        httpretty.register_uri(httpretty.GET, uri, body=body)
+
+        data, r = loading.fetch(sessions.create_session(), self.KeyedResource, 'HTTP://Example.com/loading/', {'a': 1})
+        assert data == {'name': 'Foo'}
+        assert httpretty.last_request().querystring == {'a': ['1'], 'key': ['secret']}
+        assert loading.get_validators(r) == {'If-None-Match': '"v1"'}
+        assert r.compression_stats.content_bytes == len(json.dumps({'name': 'Foo'}))
+
+        session = sessions.create_session()
+        data, r = loading.fetch(session, self.KeyedResource, uri, validators={'If-None-Match': '"v1"'})
+        assert data is None and r.status_code == 304
+
+        httpretty.register_uri(httpretty.GET, 'http://example.com/loading/missing/', status=404)
+        with pytest.raises(NotFoundException):
+            loading.fetch(sessions.create_session(), self.KeyedResource, 'http://example.com/loading/missing/')
+
+
+class TestDeadlines(object):
+    def test_get_timeout(self):
+        host_timeouts = {'slow.example.com': (5, 60)}
+        assert deadlines.get_timeout('http://example.com/', 10, host_timeouts) == 10
+        assert deadlines.get_timeout('http://slow.example.com/', 10, host_timeouts) == (5, 60)
+        assert deadlines.get_timeout('http://slow.example.com/', 10, host_timeouts, deadlines.Deadline(30)) <= (5, 30)
+        assert deadlines.get_timeout('http://example.com/', None, deadline=deadlines.Deadline(30)) <= 30
+
+        with pytest.raises(DeadlineExceeded):
+            deadlines.get_timeout('http://example.com/', 10, deadline=deadlines.Deadline(-1))
+
+    def test_resource_deadline(self, httpretty_activate):
+        httpretty.register_uri(
+            httpretty.GET, 'http://example.com/deadline-messages/', body=json.dumps({'objects': [1]})
+        )
+
+        class MessageClient(Resource):
+            id = fields.IntegerField()
+
+        class MessageListClient(Resource):
+            objects = fields.ToManyField(MessageClient, 'id', relative_path='{id}/')
+
+        with pytest.raises(DeadlineExceeded):
+            MessageListClient.get('http://example.com/deadline-messages/', deadline=-1, lazy=False)
+
+        # The deadline only bounds the initial load, so the resource stays usable once it has passed
+        c = MessageListClient.get('http://example.com/deadline-messages/', deadline=0.05, lazy=False)
+        time.sleep(0.1)
+        assert c.refresh() == set()
+        assert c.load() is c
+
+        # Lazy loads are bound by the deadline too, but only their first attempt
+        c = MessageListClient.get('http://example.com/deadline-messages/', deadline=-1)
+        with pytest.raises(DeadlineExceeded):
+            c.objects
+        assert c.objects[0]._url == 'http://example.com/deadline-messages/1/'
+
+        # Nested resources created by the initial load are first loaded within the same budget
+        httpretty.register_uri(httpretty.GET, 'http://example.com/deadline-messages/1/', body=json.dumps({'id': 1}))
+        c = MessageListClient.get('http://example.com/deadline-messages/', deadline=0.05, lazy=False)
+        time.sleep(0.1)
+        with pytest.raises(DeadlineExceeded):
+            c.objects[0].id
+        assert c.objects[0].id == 1
+
+    def test_action_deadline(self, basic_action, httpretty_activate):
+        uri = 'http://example.com/my-resource/action'
+        httpretty.register_uri(httpretty.POST, uri)
+
+        with deadlines.deadline(30):
+            basic_action.do_request(uri, '', '')
+
+            with deadlines.deadline(-1):
+                with pytest.raises(DeadlineExceeded):
+                    basic_action.do_request(uri, '', '')
+
+    def test_hedged_send(self):
+        slow, fast = Mock(), Mock()
+
+        def get(url, **kwargs):
+            if not calls:
+                calls.append(url)
+                time.sleep(0.3)
+                return slow
+
+            calls.append(url)
+            return fast
+
+        calls = []
+        assert deadlines.hedged_send(Mock(get=get), 'GET', 'http://example.com/', 0.05) is fast
+        assert len(calls) == 2
+
+        time.sleep(0.4)
+        assert slow.close.called
+        assert not fast.close.called
+
+        assert deadlines.hedged_send(Mock(get=Mock(return_value=fast)), 'GET', 'http://example.com/', 1) is fast
+
+
+class TestCache(object):
+    def test_get_set(self, tmpdir):
+        c = cache.SharedCache(str(tmpdir.join('cache')), slots=4, slot_size=256)
+
+        assert c.get('a') is None
+        assert c.set('a', {'name': 'Foo', 'tags': [1, 2]}, 60)
+        assert c.get('a') == {'name': 'Foo', 'tags': [1, 2]}
+        assert (c.hits, c.misses) == (1, 1)
+
+        assert not c.set('b', 'x' * 1000, 60)  # Too large
+        assert not c.set('b', object(), 60)
+
+        c.set('b', 'expired', -1)
+        assert c.get('b') is None
+
+        c.delete('a')
+        assert c.get('a') is None
+
+        # Least recently used entries are evicted first
+        for key in 'abcd':
+            c.set(key, key, 60)
+        c.get('a')
+        c.set('e', 'e', 60)
+        assert c.get('a') == 'a'
+        assert c.get('b') is None
+
+        c.clear()
+        assert c.get('a') is None
+        c.close()
+
+    def test_shared(self, tmpdir):
+        path = str(tmpdir.join('cache'))
+        c = cache.SharedCache(path, slots=16)
+        c.set('key', {'id': 123}, 60)
+
+        # Another process sees the entry, and the cache's size is read from the existing file
+        code = 'from restle.cache import SharedCache; c = SharedCache({0!r}); print(c.slots, c.get("key"))'.format(path)
+        output = subprocess.check_output([sys.executable, '-c', code])
+        assert output.decode('utf-8').strip() == "16 {'id': 123}"
+
+    @pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX only')
+    def test_untrusted_file(self, tmpdir):
+        path = str(tmpdir.join('cache'))
+        cache.SharedCache(path, slots=4).close()
+
+        os.chmod(path, 0o644)
+        with pytest.raises(ValueError):
+            cache.SharedCache(path)
+
+        os.chmod(path, 0o600)
+        link = str(tmpdir.join('link'))
+        os.symlink(path, link)
+        with pytest.raises(OSError):
+            cache.SharedCache(link)
+
+    def test_resource_cache(self, tmpdir, httpretty_activate):
+        httpretty.register_uri(
+            httpretty.GET, 'http://example.com/cached-resource/', body=json.dumps({'name': 'Foo'}), etag='"v1"'
+        )
+
+        class CachedResource(Resource):
+            name = fields.TextField()
+
+            class Meta:
+                cache = cache.SharedCache(str(tmpdir.join('cache')), slots=16)
+
+        start = len(httpretty.HTTPretty.latest_requests)
+        assert CachedResource.get('http://example.com/cached-resource/').name == 'Foo'
+        assert CachedResource.get('http://example.com/cached-resource/').name == 'Foo'
+        assert len(httpretty.HTTPretty.latest_requests) - start == 1
+
+        # Refreshing bypasses the cache
+        r = CachedResource.get('http://example.com/cached-resource/', lazy=False)
+        httpretty.register_uri(httpretty.GET, 'http://example.com/cached-resource/', body=json.dumps({'name': 'Bar'}))
+        assert r.refresh() == {'name'}
+        assert CachedResource.get('http://example.com/cached-resource/').name == 'Bar'
+        assert len(httpretty.HTTPretty.latest_requests) - start == 2
+
+
+class LoadMessageClient(Resource):
+    """ Resource classes for load generation tests, which are looked up by name """
+
+    id = fields.IntegerField()
+    message = fields.TextField()
+    mark_read = Action('mark-read/')
+
+
+class LoadMessageListClient(Resource):
+    objects = fields.ToManyField(LoadMessageClient, 'id', relative_path='{id}/')
+
+
+class TestLoadGenerator(object):
+    def test_main(self, tmpdir, capsys):
+        scenario = {
+            'base_url': 'http://example.com/api/',
+            'steps': [
+                {'resource': 'LoadMessageListClient', 'url': 'messages/', 'access': ['objects.*.message']},
+                {'resource': 'LoadMessageClient', 'url': 'messages/1/', 'action': 'mark_read'}
+            ],
+            'responses': {
+                '/api/messages/': {'body': {'objects': [1, 2]}},
+                '/api/messages/1/': {'body': {'id': 1, 'message': 'Hello!'}},
+                '/api/messages/2/': {'body': {'id': 2, 'message': 'Hi!'}},
+                '/api/messages/1/mark-read/': {'body': ''}
+            }
+        }
+        path = str(tmpdir.join('scenario.json'))
+        with open(path, 'w') as f:
+            json.dump(scenario, f)
+
+        assert loadgen.main(['test_restle', path, '--stub', '--iterations', '6', '--concurrency', '3']) == 0
+
+        output = capsys.readouterr()[0]
+        assert 'Steps: 12 in' in output
+        assert 'errors: 0' in output
+        assert '1: LoadMessageListClient' in output
+        assert 'hydrate' in output
+
+        scenario['responses'].pop('/api/messages/2/')
+        with open(path, 'w') as f:
+            json.dump(scenario, f)
+
+        assert loadgen.main(['test_restle', path, '--stub', '--iterations', '2']) == 1
+        assert 'errors: 2' in capsys.readouterr()[0]
+
 
 class TestFields(object):
     """Test various Field classes"""
@@ -395,6 +1838,22 @@ class TestFields(object):
         obj = f.to_python(data, Mock(_url='http://example.com/api/resource/'))
         assert obj._url == 'http://example.com/api/resource/2/'
 
+    def test_nested_field_to_value(self):
+        class NestedResource(Resource):
+            id = fields.IntegerField()
+            name = fields.TextField()
+
+        nested = NestedResource(id=2, name='Foo')
+
+        f = fields.NestedResourceField(NestedResource, 'id', relative_path='{id}/')
+        assert f.to_value(nested, None) == 2
+
+        f = fields.NestedResourceField(NestedResource, 'partial', relative_path='{id}/')
+        assert f.to_value(nested, None) == {'id': 2}
+
+        f = fields.ToManyField(NestedResource, 'full')
+        assert f.to_value([nested], None) == [{'id': 2, 'name': 'Foo'}]
+
 
 class TestExamples(object):
     """Make sure examples given in the documentation actually work"""
@@ -549,6 +2008,107 @@ class TestExamples(object):
         assert c.objects[2].id == 2489
         assert c.objects[2].read is True
 
+    def test_message_list_client_with_bulk_path(self, httpretty_activate):
+        """Tests the `MessageListClient` example, using a bulk endpoint to load messages"""
+
+        def message(message_id):
+            return {'id': message_id, 'sender': 'Pi Pyson', 'message': 'Hello!', 'read': False}
+
+        def bulk_response(request, uri, headers):
+            ids = [int(x) for x in request.querystring['ids'][0].split(',') if x != '2489']
+            return 200, headers, json.dumps({'objects': [message(x) for x in reversed(ids)]})
+
+        httpretty.register_uri(httpretty.GET, 'http://example.com/api/messages/bulk/', body=bulk_response)
+        httpretty.register_uri(httpretty.GET, 'http://example.com/api/messages/2489/', body=json.dumps(message(2489)))
+        httpretty.register_uri(
+            httpretty.GET, 'http://example.com/api/messages/', body=json.dumps({'objects': [2389, 2374, 2489]})
+        )
+
+        class MessageClient(Resource):
+            id = fields.IntegerField()
+            sender = fields.TextField()
+            message = fields.TextField()
+            read = fields.BooleanField()
+
+        class MessageListClient(Resource):
+            objects = fields.ToManyField(
+                MessageClient, 'id', relative_path='{id}/', bulk_path='bulk/?ids={ids}', bulk_size=2, bulk_key='objects'
+            )
+
+        start = len(httpretty.HTTPretty.latest_requests)
+        c = MessageListClient.get('http://example.com/api/messages/', lazy=False)
+        assert len(httpretty.HTTPretty.latest_requests) - start == 1
+
+        assert c.objects[0].id == 2389
+        assert c.objects[1].id == 2374
+        assert len(httpretty.HTTPretty.latest_requests) - start == 2
+        assert httpretty.last_request().path.startswith('/api/messages/bulk/?')
+        assert httpretty.last_request().querystring == {'ids': ['2389,2374']}
+
+        # Missing from the bulk response, so loaded individually
+        assert c.objects[2].id == 2489
+        assert len(httpretty.HTTPretty.latest_requests) - start == 4
+        assert httpretty.last_request().path == '/api/messages/2489/'
+
+    def test_message_list_client_with_expand(self, httpretty_activate):
+        """Tests the `MessageListClient` example, asking the server to inline messages and their senders"""
+
+        sender = {'id': 7, 'name': 'Pi Pyson'}
+        messages = [{'id': x, 'sender': 7, 'message': 'Hello!', 'read': False} for x in (2389, 2374)]
+
+        def list_response(request, uri, headers):
+            expand = request.querystring.get('expand', [''])[0].split(',')
+            objects = [x['id'] for x in messages]
+            if 'messages.from' in expand:
+                objects = [dict(x, sender=sender) for x in messages]
+            return 200, headers, json.dumps({'objects': objects})
+
+        httpretty.register_uri(httpretty.GET, 'http://example.com/api/messages/', body=list_response)
+        for message in messages:
+            httpretty.register_uri(
+                httpretty.GET, 'http://example.com/api/messages/{0}/'.format(message['id']), body=json.dumps(message)
+            )
+        httpretty.register_uri(httpretty.GET, 'http://example.com/api/messages/7/', body=json.dumps(sender))
+
+        class SenderClient(Resource):
+            id = fields.IntegerField()
+            name = fields.TextField()
+
+        class MessageClient(Resource):
+            id = fields.IntegerField()
+            sender = fields.ToOneField(SenderClient, 'id', relative_path='../{id}/', expand_name='from')
+            message = fields.TextField()
+            read = fields.BooleanField()
+
+        class MessageListClient(Resource):
+            objects = fields.ToManyField(MessageClient, 'id', relative_path='{id}/', expand_name='messages')
+
+        start = len(httpretty.HTTPretty.latest_requests)
+        c = MessageListClient.get('http://example.com/api/messages/', lazy=False, expand=['objects.sender'])
+        assert httpretty.last_request().querystring == {'expand': ['messages.from']}
+        assert [x.message for x in c.objects] == ['Hello!', 'Hello!']
+        assert c.objects[0].sender.name == 'Pi Pyson'
+        assert c.objects[0]._url == 'http://example.com/api/messages/2389/'
+        assert len(httpretty.HTTPretty.latest_requests) - start == 1
+
+        # This server only inlines messages along with their senders, so here messages are loaded separately
+        start = len(httpretty.HTTPretty.latest_requests)
+        c = MessageListClient.get('http://example.com/api/messages/', lazy=False, expand=['objects'])
+        assert httpretty.last_request().querystring == {'expand': ['messages']}
+        assert c.objects[0].message == 'Hello!'
+        assert len(httpretty.HTTPretty.latest_requests) - start == 2
+
+        # A sender the server only partly inlined is loaded from its URI
+        sender_uri = 'http://example.com/api/messages/8/'
+        httpretty.register_uri(httpretty.GET, sender_uri, body=json.dumps({'id': 8, 'name': 'Bob'}))
+        message = MessageClient.get('http://example.com/api/messages/2389/', expand=['sender'])
+        message.populate_field_values({'id': 2389, 'sender': {'id': 8}, 'message': 'Hi!', 'read': False})
+        assert message.sender.name == 'Bob'
+        assert httpretty.last_request().path == '/api/messages/8/'
+
+        with pytest.raises(ValueError):
+            MessageListClient.get('http://example.com/api/messages/', expand=['objects.message'])
+
     def test_fuzzy_key_matching(self, httpretty_activate):
         """ Tests the fuzzy key matching example """
 